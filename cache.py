@@ -0,0 +1,171 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+CACHE_DIR = os.environ.get("PDEFFER_CACHE_DIR", "tmp_local/pdeffer_cache")
+DOCUMENT_CACHE_BYTES = int(os.environ.get("PDEFFER_DOCUMENT_CACHE_BYTES", 2 * 1024 ** 3))
+PAGE_CACHE_BYTES = int(os.environ.get("PDEFFER_PAGE_CACHE_BYTES", 512 * 1024 ** 2))
+
+# Bump whenever a change alters the pipeline output, so stale entries stop matching
+CACHE_VERSION = 6
+
+
+def _params_digest(params):
+    return json.dumps({"version": CACHE_VERSION, **params}, sort_keys=True)
+
+
+def document_key(pdf_sha256, params):
+    """Cache key for a whole document: hash of the PDF bytes plus the processing parameters."""
+    return hashlib.sha256(f"{pdf_sha256}|{_params_digest(params)}".encode()).hexdigest()
+
+
+def page_key(image_cv, params):
+    """Cache key for one rendered page: hash of the page pixels plus the OCR parameters."""
+    h = hashlib.sha256()
+    h.update(str(image_cv.shape).encode())
+    h.update(np.ascontiguousarray(image_cv).data)
+    h.update(_params_digest(params).encode())
+    return h.hexdigest()
+
+
+def json_default(value):
+    # json.dump `default` hook: OCR results may carry NumPy scalars/arrays from OpenCV
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class LRUDiskCache:
+    """
+    Content-addressed file cache with least-recently-used eviction by total size.
+
+    Reading and writing entries (read_json/write_json/path) touches only the filesystem and is
+    safe from worker processes. The LRU index and the hit/miss counters live in the process
+    that owns the cache object, which learns about lookups done elsewhere through record().
+    """
+
+    def __init__(self, directory, max_bytes, suffix):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._index = None  # key -> size, least recently used first
+        self._total = 0
+        self._lock = threading.Lock()
+
+    def path(self, key):
+        return os.path.join(self.directory, key[:2], key + self.suffix)
+
+    def _load_index(self):
+        # Built once from whatever is on disk, oldest entries first
+        entries = []
+        if os.path.isdir(self.directory):
+            for root, _, files in os.walk(self.directory):
+                for name in files:
+                    if name.endswith(self.suffix):
+                        st = os.stat(os.path.join(root, name))
+                        entries.append((st.st_mtime, name[:-len(self.suffix)], st.st_size))
+        entries.sort()
+        self._index = OrderedDict((key, size) for _, key, size in entries)
+        self._total = sum(self._index.values())
+
+    def _evict(self):
+        while self._total > self.max_bytes and self._index:
+            key, size = self._index.popitem(last=False)
+            self._total -= size
+            self.evictions += 1
+            try:
+                os.remove(self.path(key))
+            except FileNotFoundError:
+                pass
+
+    def _add(self, key):
+        # Caller holds the lock and has loaded the index
+        try:
+            size = os.path.getsize(self.path(key))
+        except FileNotFoundError:
+            return
+        self._total += size - self._index.pop(key, 0)
+        self._index[key] = size
+        self._evict()
+
+    def record(self, key, hit):
+        """
+        Account for a lookup of `key`: a hit refreshes its LRU position, a miss that has since
+        been stored is added to the index (evicting older entries if over budget).
+        """
+        with self._lock:
+            if self._index is None:
+                self._load_index()
+            if hit:
+                self.hits += 1
+                if key in self._index:
+                    self._index.move_to_end(key)
+                try:
+                    os.utime(self.path(key))
+                except FileNotFoundError:
+                    pass
+                return
+
+            self.misses += 1
+            self._add(key)
+
+    def lookup(self, key):
+        """Return the path of a cached entry (recording the hit/miss), or None."""
+        path = self.path(key)
+        hit = os.path.exists(path)
+        self.record(key, hit)
+        return path if hit else None
+
+    def _write_atomic(self, key, write):
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        write(tmp_path)
+        os.replace(tmp_path, path)
+        return path
+
+    def store_file(self, key, src_path):
+        """Copy a finished file into the cache and index it."""
+        self._write_atomic(key, lambda tmp: shutil.copyfile(src_path, tmp))
+        with self._lock:
+            if self._index is None:
+                self._load_index()
+            self._add(key)
+
+    def read_json(self, key):
+        try:
+            with open(self.path(key), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def write_json(self, key, obj):
+        def _write(tmp_path):
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(obj, f, default=json_default)
+        return self._write_atomic(key, _write)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._index) if self._index is not None else None,
+                "bytes": self._total if self._index is not None else None,
+                "max_bytes": self.max_bytes,
+            }
+
+
+document_cache = LRUDiskCache(os.path.join(CACHE_DIR, "documents"), DOCUMENT_CACHE_BYTES, ".docx")
+page_cache = LRUDiskCache(os.path.join(CACHE_DIR, "pages"), PAGE_CACHE_BYTES, ".json")
@@ -1,4 +1,60 @@
+import re
+from xml.sax.saxutils import escape
+
 from docx import Document
+from docx.oxml import parse_xml
+from docx.oxml.ns import nsdecls, qn
+
+# Characters XML 1.0 does not allow; OCR output occasionally contains them
+_INVALID_XML_CHARS = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f]")
+# Rows parsed per XML fragment, so very large tables don't build one huge string
+_ROWS_PER_CHUNK = 1000
+
+
+def _run_xml(text):
+    # Same markup python-docx produces for run.text: "\n" -> <w:br/>, "\t" -> <w:tab/>
+    text = _INVALID_XML_CHARS.sub("", text)
+    parts = []
+    for i, line in enumerate(text.split("\n")):
+        if i:
+            parts.append("<w:br/>")
+        for j, chunk in enumerate(line.split("\t")):
+            if j:
+                parts.append("<w:tab/>")
+            if chunk:
+                parts.append(f'<w:t xml:space="preserve">{escape(chunk)}</w:t>')
+    return f"<w:r>{''.join(parts)}</w:r>" if parts else ""
+
+
+def add_table_rows(doc, data, style="Table Grid"):
+    """
+    Add a table holding `data` (a list of rows of cell strings) to the document.
+
+    Produces the same markup as doc.add_table() + cell(r, c).text, but builds the rows as XML
+    in bulk instead of going through cell(), which re-walks the whole table on every call and
+    makes large tables quadratic. Cost is linear in the number of cells.
+    """
+    n_cols = max(len(row) for row in data)
+    table = doc.add_table(rows=0, cols=n_cols)
+    table.style = style
+
+    widths = [grid_col.get(qn("w:w")) for grid_col in table._tbl.tblGrid.findall(qn("w:gridCol"))]
+    tc_prs = [f'<w:tcPr><w:tcW w:type="dxa" w:w="{w}"/></w:tcPr>' if w else "" for w in widths]
+
+    for start in range(0, len(data), _ROWS_PER_CHUNK):
+        rows_xml = []
+        for row in data[start:start + _ROWS_PER_CHUNK]:
+            cells_xml = []
+            for c in range(n_cols):
+                text = row[c] if c < len(row) else ""
+                cells_xml.append(f"<w:tc>{tc_prs[c]}<w:p>{_run_xml(text or '')}</w:p></w:tc>")
+            rows_xml.append(f"<w:tr>{''.join(cells_xml)}</w:tr>")
+
+        fragment = parse_xml(f"<w:tbl {nsdecls('w')}>{''.join(rows_xml)}</w:tbl>")
+        table._tbl.extend(list(fragment))  # Moves the parsed rows into the table
+
+    return table
+
 
 def write_multi_page_ocr_output_to_docx(ocr_data_pages, output_path):
     """
@@ -15,6 +71,7 @@ def write_multi_page_ocr_output_to_docx(ocr_data_pages, output_path):
         if top_text:
             # doc.add_paragraph(top_text)#
             #doc.add_paragraph("")  # spacing#
+            pass
 
         if not tables:
             doc.add_paragraph("No tables detected.")
@@ -22,11 +79,7 @@ def write_multi_page_ocr_output_to_docx(ocr_data_pages, output_path):
             for t_index, table in enumerate(tables):
                 data = table.get("data", [])
                 if data:
-                    doc_table = doc.add_table(rows=len(data), cols=len(data[0]))
-                    doc_table.style = "Table Grid"
-                    for r, row in enumerate(data):
-                        for c, cell_text in enumerate(row):
-                            doc_table.cell(r, c).text = cell_text or ""
+                    add_table_rows(doc, data, style="Table Grid")
                     doc.add_paragraph("")  # spacing after each table
 
         if i < len(ocr_data_pages) - 1:
@@ -0,0 +1,248 @@
+import os
+import shutil
+import socket
+import sqlite3
+import threading
+import time
+
+# Finished jobs are deleted this long after they finish
+JOB_TTL_SECONDS = int(os.environ.get("PDEFFER_JOB_TTL_SECONDS", 3600))
+# Disk budget for all job folders; finished jobs are evicted early to stay under it
+JOB_STORE_MAX_BYTES = int(os.environ.get("PDEFFER_JOB_STORE_MAX_BYTES", 5 * 1024 ** 3))
+# How often expired jobs are looked up in the index
+JOB_STORE_SWEEP_SECONDS = int(os.environ.get("PDEFFER_JOB_STORE_SWEEP_SECONDS", 60))
+
+INDEX_FILENAME = "jobs.sqlite3"
+# Files a finished job keeps; everything else in its folder is deleted by finish(). Besides the
+# DOCX (or a batch's ZIP of DOCX files) and the trace bundle these are the job record and page
+# results of the shared registry (see jobs.JobRegistry), when the local storage backend lives in
+# the job folders.
+KEEP_FILES = ("output.docx", "output.zip", "trace", "job.json", "results")
+
+
+def directory_bytes(path):
+    """Total size of the files under `path`."""
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass  # Removed concurrently
+    return total
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True  # Exists, owned by another user
+    return True
+
+
+class JobStore:
+    """
+    Job folders under `root`, with their size and expiry tracked in a SQLite index.
+
+    A job is active from create() until finish(); active jobs are never deleted. A finished
+    job keeps only its KEEP_FILES and expires `ttl` seconds later. Expired jobs are deleted by
+    expire(), and finished jobs are evicted early, soonest expiry first, whenever the store
+    goes over `max_bytes`. Both only read the index rows of the jobs they delete, never the
+    directory listing.
+
+    `on_remove(job_id)` is called for every deleted job, e.g. to drop it from the job registry.
+
+    Several server processes (and hosts, with a shared `root`) may use the same store; every
+    active job records the host and pid running it, so that recover() only reclaims the jobs
+    of processes that are gone.
+    """
+
+    def __init__(self, root, max_bytes=JOB_STORE_MAX_BYTES, ttl=JOB_TTL_SECONDS, on_remove=None):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.on_remove = on_remove
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._db = None
+
+    def _conn(self):
+        # Caller holds the lock
+        if self._db is None:
+            os.makedirs(self.root, exist_ok=True)
+            self._db = sqlite3.connect(os.path.join(self.root, INDEX_FILENAME), check_same_thread=False,
+                                       isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " job_id TEXT PRIMARY KEY,"
+                " bytes INTEGER NOT NULL DEFAULT 0,"
+                " created REAL NOT NULL,"
+                " expires REAL,"  # NULL while the job is active
+                " active INTEGER NOT NULL DEFAULT 1,"
+                " owner_host TEXT,"  # Host and pid of the process running the job
+                " owner_pid INTEGER)"
+            )
+            columns = {row[1] for row in self._db.execute("PRAGMA table_info(jobs)")}
+            for column in ("owner_host TEXT", "owner_pid INTEGER"):
+                # Index from before jobs recorded their owner
+                if column.split()[0] not in columns:
+                    try:
+                        self._db.execute(f"ALTER TABLE jobs ADD COLUMN {column}")
+                    except sqlite3.OperationalError:
+                        pass  # Added by another process meanwhile
+            self._db.execute("CREATE INDEX IF NOT EXISTS jobs_expires ON jobs (active, expires)")
+        return self._db
+
+    def path(self, job_id, *parts):
+        return os.path.join(self.root, job_id, *parts)
+
+    def recover(self):
+        """
+        Bring the index in line with the disk after a restart. Active jobs whose process on
+        this host is gone (or recorded no owner) expire now; those of live processes, such as
+        the other workers of the same server, and of other hosts are left alone. Job folders
+        missing from the index (e.g. from before the index existed) are added, expiring `ttl`
+        after their last modification. Runs once at startup, so this is the only place the
+        directory is listed.
+        """
+        now = time.time()
+        host, pid = socket.gethostname(), os.getpid()
+        with self._lock:
+            db = self._conn()
+            for job_id, owner_host, owner_pid in db.execute(
+                    "SELECT job_id, owner_host, owner_pid FROM jobs WHERE active = 1").fetchall():
+                if owner_pid is not None and owner_host != host:
+                    continue
+                # A pid equal to ours was an earlier run of this process (e.g. pid 1 in a container)
+                if owner_pid is not None and owner_pid != pid and _pid_alive(owner_pid):
+                    continue
+                db.execute("UPDATE jobs SET active = 0, expires = ? WHERE job_id = ? AND active = 1", (now, job_id))
+            known = {row[0] for row in db.execute("SELECT job_id FROM jobs")}
+            for name in os.listdir(self.root):
+                folder = os.path.join(self.root, name)
+                if name in known or not os.path.isdir(folder):
+                    continue
+                mtime = os.path.getmtime(folder)
+                db.execute("INSERT INTO jobs (job_id, bytes, created, expires, active) VALUES (?, ?, ?, ?, 0)",
+                           (name, directory_bytes(folder), mtime, mtime + self.ttl))
+        self.expire()
+
+    def create(self, job_id):
+        """Register a new active job, owned by this process, and return its (empty) folder."""
+        # Indexed before the folder exists, so that recover() in another process never takes
+        # the folder for an unindexed leftover
+        with self._lock:
+            self._conn().execute(
+                "INSERT OR REPLACE INTO jobs (job_id, created, owner_host, owner_pid) VALUES (?, ?, ?, ?)",
+                (job_id, time.time(), socket.gethostname(), os.getpid()))
+        folder = self.path(job_id)
+        os.makedirs(folder, exist_ok=True)
+        return folder
+
+    def set_size(self, job_id, size=None):
+        """Record a job's disk usage (measured if not given) and evict if over budget."""
+        if size is None:
+            size = directory_bytes(self.path(job_id))
+        with self._lock:
+            self._conn().execute("UPDATE jobs SET bytes = ? WHERE job_id = ?", (size, job_id))
+        self.ensure_space(0)
+
+    def finish(self, job_id, keep=KEEP_FILES):
+        """
+        Mark a job as finished: delete everything in its folder except `keep` (pass None to
+        keep all files), record the remaining size and start its TTL.
+        """
+        folder = self.path(job_id)
+        if keep is not None and os.path.isdir(folder):
+            for name in os.listdir(folder):
+                if name in keep:
+                    continue
+                entry = os.path.join(folder, name)
+                try:
+                    if os.path.isdir(entry):
+                        shutil.rmtree(entry)
+                    else:
+                        os.remove(entry)
+                except OSError as e:
+                    print(f"[job_store] Failed to remove {entry}: {e}")
+
+        size = directory_bytes(folder)
+        with self._lock:
+            self._conn().execute("UPDATE jobs SET bytes = ?, active = 0, expires = ? WHERE job_id = ?",
+                                 (size, time.time() + self.ttl, job_id))
+        self.ensure_space(0)
+
+    def total_bytes(self):
+        with self._lock:
+            return self._conn().execute("SELECT COALESCE(SUM(bytes), 0) FROM jobs").fetchone()[0]
+
+    def ensure_space(self, incoming_bytes):
+        """
+        Evict finished jobs, soonest expiry first, until `incoming_bytes` more fit in the
+        budget. Returns False, without evicting anything, if they cannot fit because the rest
+        is active jobs.
+        """
+        with self._lock:
+            db = self._conn()
+            total = db.execute("SELECT COALESCE(SUM(bytes), 0) FROM jobs").fetchone()[0]
+            if total + incoming_bytes <= self.max_bytes:
+                return True
+            finished = db.execute("SELECT COALESCE(SUM(bytes), 0) FROM jobs WHERE active = 0").fetchone()[0]
+            if total - finished + incoming_bytes > self.max_bytes:
+                return False  # Evicting everything would not be enough
+            victims = []
+            for job_id, size in db.execute("SELECT job_id, bytes FROM jobs WHERE active = 0 ORDER BY expires"):
+                if total + incoming_bytes <= self.max_bytes:
+                    break
+                victims.append(job_id)
+                total -= size
+        for job_id in victims:
+            self.remove(job_id)
+            self.evictions += 1
+        if victims:
+            print(f"[job_store] Evicted {len(victims)} finished job(s) to stay under {self.max_bytes} bytes")
+        return total + incoming_bytes <= self.max_bytes
+
+    def expire(self, now=None):
+        """Delete the finished jobs whose TTL has run out. Returns their IDs."""
+        now = time.time() if now is None else now
+        with self._lock:
+            expired = [row[0] for row in self._conn().execute(
+                "SELECT job_id FROM jobs WHERE active = 0 AND expires <= ?", (now,))]
+        for job_id in expired:
+            self.remove(job_id)
+        if expired:
+            print(f"[job_store] Removed {len(expired)} expired job(s)")
+        return expired
+
+    def remove(self, job_id):
+        """Delete a job's folder and index row."""
+        folder = self.path(job_id)
+        try:
+            shutil.rmtree(folder)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"[job_store] Failed to remove {folder}: {e}")
+            return
+        with self._lock:
+            self._conn().execute("DELETE FROM jobs WHERE job_id = ?", (job_id,))
+        if self.on_remove is not None:
+            self.on_remove(job_id)
+
+    def stats(self):
+        with self._lock:
+            db = self._conn()
+            jobs_active, jobs_finished = db.execute(
+                "SELECT COALESCE(SUM(active), 0), COALESCE(SUM(1 - active), 0) FROM jobs").fetchone()
+            total = db.execute("SELECT COALESCE(SUM(bytes), 0) FROM jobs").fetchone()[0]
+        return {
+            "active": jobs_active,
+            "finished": jobs_finished,
+            "bytes": total,
+            "max_bytes": self.max_bytes,
+            "evictions": self.evictions,
+        }
@@ -0,0 +1,170 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+import storage
+
+# Jobs running at once. Their pages wait for slots from scheduler.py before reaching the worker
+# pool, so a job thread costs little while it waits; this only needs to exceed the number of
+# jobs that should make progress side by side.
+JOB_RUNNERS = int(os.environ.get("PDEFFER_JOB_RUNNERS", 32))
+# Minimum interval between progress-only writes of a job record to the storage
+REGISTRY_PERSIST_SECONDS = float(os.environ.get("PDEFFER_REGISTRY_PERSIST_SECONDS", 1.0))
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class JobRegistry:
+    """
+    Thread-safe record of every job's state and progress.
+
+    Jobs are kept in memory by the process running them. With a `storage` backend (see
+    storage.py) every state change and page result is also written there, as
+    "<job_id>/job.json" and "<job_id>/results/<n>_page_<page>.json", so that any process or
+    host sharing the storage can answer get() and page_results() for the job. New jobs and
+    state changes are written right away; other updates (progress counters, per-document
+    status) at most every REGISTRY_PERSIST_SECONDS per job, so large records are not
+    rewritten for every page.
+    """
+
+    def __init__(self, storage=None):
+        self.storage = storage
+        self._jobs = {}
+        self._page_results = {}  # job_id -> [(page_number, result)] in completion order
+        self._lock = threading.Lock()
+        self._persist_lock = threading.Lock()
+        self._persisted_at = {}  # job_id -> time of the last job.json write
+
+    def _persist(self, job_id, force=True):
+        if self.storage is None:
+            return
+        # Serialized so that an older snapshot never overwrites a newer one
+        with self._persist_lock:
+            now = time.monotonic()
+            if not force and now - self._persisted_at.get(job_id, float("-inf")) < REGISTRY_PERSIST_SECONDS:
+                return
+            with self._lock:
+                job = self._jobs.get(job_id)
+                if job is None:
+                    return
+                job = dict(job)
+            storage.put_json(self.storage, f"{job_id}/job.json", job)
+            self._persisted_at[job_id] = now
+
+    def create(self, job_id, **fields):
+        job = {
+            "job_id": job_id,
+            "state": QUEUED,
+            "pages_total": None,
+            "pages_done": 0,
+            "cells": 0,
+            "blank_cells_skipped": 0,
+            "error": None,
+            "created_at": time.time(),
+            "finished_at": None,
+        }
+        job.update(fields)
+        with self._lock:
+            self._jobs[job_id] = job
+        self._persist(job_id)
+        return dict(job)
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                return dict(job)
+        if self.storage is not None:
+            # Job run by another process or host
+            return storage.get_json(self.storage, f"{job_id}/job.json")
+        return None
+
+    def update(self, job_id, **fields):
+        with self._lock:
+            if job_id not in self._jobs:
+                return
+            self._jobs[job_id].update(fields)
+        self._persist(job_id, force="state" in fields)
+
+    def increment(self, job_id, field, amount=1):
+        with self._lock:
+            if job_id in self._jobs:
+                self._jobs[job_id][field] = (self._jobs[job_id].get(field) or 0) + amount
+
+    def add_page_result(self, job_id, page_number, result):
+        with self._lock:
+            if job_id not in self._jobs:
+                return
+            results = self._page_results.setdefault(job_id, [])
+            results.append((page_number, result))
+            index = len(results) - 1
+        if self.storage is not None:
+            key = f"{job_id}/results/{index:05d}_page_{page_number:04d}.json"
+            storage.put_json(self.storage, key, {"page": page_number, "result": result})
+            self._persist(job_id, force=False)
+
+    def page_results(self, job_id, start=0):
+        """Page results of a job in the order they finished, from index `start` on."""
+        with self._lock:
+            if job_id in self._jobs:
+                return list(self._page_results.get(job_id, [])[start:])
+        if self.storage is None:
+            return []
+
+        results = []
+        for key in self.storage.list(f"{job_id}/results/")[start:]:
+            entry = storage.get_json(self.storage, key)
+            if entry is None:
+                break  # Removed meanwhile
+            results.append((entry["page"], entry["result"]))
+        return results
+
+    def count(self, state):
+        """Number of jobs currently in `state`."""
+        with self._lock:
+            return sum(1 for job in self._jobs.values() if job["state"] == state)
+
+    def remove(self, job_id):
+        with self._lock:
+            self._jobs.pop(job_id, None)
+            self._page_results.pop(job_id, None)
+        with self._persist_lock:
+            self._persisted_at.pop(job_id, None)
+
+
+registry = JobRegistry(storage=storage.get_storage())
+_runner = ThreadPoolExecutor(max_workers=JOB_RUNNERS, thread_name_prefix="job")
+
+
+def _run(job_id, fn, args, kwargs):
+    registry.update(job_id, state=RUNNING)
+    start = time.perf_counter()
+    try:
+        fn(job_id, *args, **kwargs)
+    except Exception as e:
+        print(f"[job] {job_id} failed: {e}")
+        registry.update(job_id, state=FAILED, error=str(e), finished_at=time.time())
+        metrics.jobs_finished.inc(state=FAILED)
+    else:
+        registry.update(job_id, state=DONE, finished_at=time.time())
+        metrics.jobs_finished.inc(state=DONE)
+    metrics.stage_seconds.observe(time.perf_counter() - start, stage="job")
+
+
+def submit(job_id, fn, *args, job_fields=None, **kwargs):
+    """
+    Register a job (with any extra `job_fields` in its record) and run
+    `fn(job_id, *args, **kwargs)` on a background thread.
+    The job is DONE when fn returns and FAILED (with the error message) when it raises.
+    """
+    registry.create(job_id, **(job_fields or {}))
+    return _runner.submit(_run, job_id, fn, args, kwargs)
+
+
+def shutdown():
+    _runner.shutdown(wait=False, cancel_futures=True)
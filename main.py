@@ -1,85 +1,684 @@
 import os
 import io
+import json
+import asyncio
 import uuid
+import hashlib
 import time
 import shutil
-from fastapi import FastAPI, UploadFile, File, HTTPException, Query
-from fastapi.responses import FileResponse
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+from fastapi import FastAPI, UploadFile, File, HTTPException, Query, Request
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse, Response
 from fastapi_utils.tasks import repeat_every
-from PIL import Image
-import pdf_to_png
-import png_ocr
+import cache
 import docx_writer
+import job_store
+import jobs
+import metrics
+import ocr_engine
+import pdf_to_png
+import scheduler
+import storage
+import tracing
+import workers
 
 app = FastAPI()
 
 TEMP_DIR = "tmp_local/pdeffer"
-CLEANUP_OLDER_THAN_SECONDS = 3600  # 1 hour
+ARCHIVE_PAGES = False  # Keep a PNG of every rendered page in the job folder
+DPI = 300
+DOCX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+ZIP_MEDIA_TYPE = "application/zip"
+UPLOAD_CHUNK_SIZE = 1024 * 1024  # 1 MiB
+MAX_UPLOAD_BYTES = 200 * 1024 * 1024  # 200 MiB
+MULTIPART_OVERHEAD_BYTES = 64 * 1024  # Form boundaries and part headers around an upload
+STREAM_POLL_SECONDS = 0.25
+MAX_BATCH_DOCUMENTS = 1000
+MAX_BATCH_BYTES = 2 * 1024 * 1024 * 1024  # 2 GiB of PDFs per batch, counting those extracted from ZIPs
+BATCH_DOCUMENTS_IN_FLIGHT = 4  # Documents of one batch converted at once; their pages share the scheduler
+
+def output_key(job_id):
+    """Storage key of a job's DOCX."""
+    return f"{job_id}/output.docx"
+
+def batch_output_key(job_id):
+    """Storage key of a batch job's ZIP of DOCX files."""
+    return f"{job_id}/output.zip"
+
+def remove_job(job_id):
+    jobs.registry.remove(job_id)
+    storage.get_storage().delete_prefix(f"{job_id}/")
+
+# Local job folders (the scratch space of the jobs this process runs), with their sizes and
+# expiry in an index; deleted jobs leave the registry and the shared storage too
+store = job_store.JobStore(TEMP_DIR, on_remove=remove_job)
+
+# Computed when /metrics is scraped, so they cost nothing while jobs run
+metrics.Gauge("pdeffer_jobs_queued", "Jobs waiting for a job runner", fn=lambda: jobs.registry.count(jobs.QUEUED))
+metrics.Gauge("pdeffer_jobs_running", "Jobs being processed", fn=lambda: jobs.registry.count(jobs.RUNNING))
+metrics.Gauge("pdeffer_pages_in_flight", "Pages holding a scheduler slot", fn=scheduler.scheduler.in_flight)
+metrics.Gauge("pdeffer_backlog_pages", "Pages admitted but not done yet", fn=scheduler.scheduler.backlog_pages)
+metrics.Gauge("pdeffer_temp_dir_bytes", "Disk usage of the job folders", fn=store.total_bytes)
+metrics.Gauge("pdeffer_cache_bytes", "Disk usage of the document and page caches",
+              fn=lambda: job_store.directory_bytes(cache.CACHE_DIR))
+
+@app.on_event("startup")
+def recover_job_store() -> None:
+    store.recover()
 
 @app.on_event("startup")
-@repeat_every(seconds=60 * 30)  # every 30 minutes
-def cleanup_old_jobs() -> None:
-    now = time.time()
-    if not os.path.exists(TEMP_DIR):
-        return
-    for job_folder in os.listdir(TEMP_DIR):
-        folder_path = os.path.join(TEMP_DIR, job_folder)
-        if os.path.isdir(folder_path):
-            last_modified = os.path.getmtime(folder_path)
-            age = now - last_modified
-            if age > CLEANUP_OLDER_THAN_SECONDS:
-                try:
-                    shutil.rmtree(folder_path)
-                    print(f"[cleanup] Removed old job folder: {folder_path}")
-                except Exception as e:
-                    print(f"[cleanup] Failed to remove {folder_path}: {e}")
+@repeat_every(seconds=job_store.JOB_STORE_SWEEP_SECONDS)
+def expire_old_jobs() -> None:
+    # Indexed lookup of the expired jobs only, however many folders there are
+    store.expire()
+
+@app.on_event("shutdown")
+def shutdown_workers() -> None:
+    jobs.shutdown()
+    workers.shutdown()
+
+@app.middleware("http")
+async def reject_large_uploads(request: Request, call_next):
+    """
+    Answer 413 to uploads whose Content-Length is already over the limit, before the form is
+    read: Starlette spools the whole multipart body before an endpoint runs. Uploads sent
+    without a Content-Length (chunked) are only stopped by save_upload, which keeps them out
+    of the job folder but not out of the spooled form.
+    """
+    limits = {"/process/": MAX_UPLOAD_BYTES, "/batch/": MAX_BATCH_BYTES}
+    limit = limits.get(request.url.path) if request.method == "POST" else None
+    length = request.headers.get("content-length", "")
+    if limit is not None and length.isdigit() and int(length) > limit + MULTIPART_OVERHEAD_BYTES:
+        metrics.errors.inc(stage="upload")
+        return JSONResponse(status_code=413, content={"detail": f"Upload larger than {limit} bytes"})
+    return await call_next(request)
+
+def run_pdf_job(job_id, pdf_path, work_dir, ocr_options, debug=False, document_key=None, trace=False,
+                page_count=None, client_id=None):
+    """
+    Full pipeline for one uploaded PDF; runs on a background job thread.
+    With a document_key, the finished DOCX is added to the document cache.
+    With trace, a trace bundle (span trees, sampled debug images) is written to <work_dir>/trace
+    and uploaded to the storage when the job ends.
+    Pages are scheduled through scheduler.scheduler on behalf of client_id.
+    """
+    trace_dir = os.path.join(work_dir, "trace") if trace else None
+    tracer = tracing.Tracer(trace_dir, "job", image_rate=0) if trace else tracing.NULL_TRACER
+    try:
+        _run_pdf_job(job_id, pdf_path, work_dir, ocr_options, debug, document_key, trace_dir, tracer,
+                     page_count, client_id)
+    finally:
+        scheduler.scheduler.finish(job_id)
+        if trace_dir:
+            tracer.write()
+            tracing.flush()  # The job's own span tree; process_pdf_pages waited for the pages'
+            upload_trace(job_id, trace_dir)
+        # Only the DOCX (and trace) outlive the job; debug runs keep the PDF and page images
+        store.finish(job_id, keep=None if debug else job_store.KEEP_FILES)
+
+def upload_trace(job_id, trace_dir):
+    """Copy a job's trace bundle to the storage as <job_id>/trace/..., for /trace on any instance."""
+    backend = storage.get_storage()
+    for root, _, files in os.walk(trace_dir):
+        for name in files:
+            if name.endswith(".tmp"):
+                continue
+            path = os.path.join(root, name)
+            rel = os.path.relpath(path, trace_dir).replace(os.sep, "/")
+            try:
+                backend.put_file(f"{job_id}/trace/{rel}", path)
+            except Exception as e:
+                print(f"[job] {job_id}: failed to upload trace file {rel}: {e}")
+
+def _run_pdf_job(job_id, pdf_path, work_dir, ocr_options, debug, document_key, trace_dir, tracer,
+                 page_count, client_id):
+    if page_count is None:
+        page_count = pdf_to_png.get_page_count(pdf_path)
+    jobs.registry.update(job_id, pages_total=page_count)
+    tracer.annotate(job_id=job_id, pages=page_count, debug=debug, **ocr_options)
+
+    # Render and OCR the pages in parallel on the worker pool, then write the DOCX
+    docx_path = os.path.join(work_dir, "output.docx")
+    archive_dir = work_dir if debug or ARCHIVE_PAGES else None
+    convert_pdf(job_id, pdf_path, docx_path, page_count, ocr_options, client_id, on_page=page_recorder(job_id),
+                debug=debug, archive_dir=archive_dir, trace_dir=trace_dir, tracer=tracer)
+
+    # Any process or host sharing the storage can serve the download from here on
+    storage.get_storage().put_file(output_key(job_id), docx_path)
+
+    if document_key is not None:
+        cache.document_cache.store_file(document_key, docx_path)
+
+def page_recorder(job_id, document=None):
+    """on_page callback that adds a finished page to the job's progress, stats and results."""
+    def on_page(page_number, result):
+        metrics.record_page(result)
+        jobs.registry.increment(job_id, "pages_done")
+        stats = result.get("stats", {})
+        jobs.registry.increment(job_id, "cells", stats.get("cells", 0))
+        jobs.registry.increment(job_id, "blank_cells_skipped", stats.get("blank_cells_skipped", 0))
+        if document is not None:
+            result["document"] = document
+        jobs.registry.add_page_result(job_id, page_number, result)
+    return on_page
+
+def convert_pdf(job_id, pdf_path, docx_path, page_count, ocr_options, client_id, on_page=None, debug=False,
+                archive_dir=None, trace_dir=None, tracer=tracing.NULL_TRACER):
+    """
+    OCR every page of one PDF on the shared worker pool, scheduled for client_id as part of
+    job_id, and write the results to one multi-page DOCX at docx_path.
+    """
+    try:
+        with tracer.span("pages"):
+            ocr_results = workers.process_pdf_pages(
+                pdf_path, page_count=page_count, dpi=DPI, archive_dir=archive_dir, on_page=on_page,
+                trace_dir=trace_dir, scheduler=scheduler.scheduler, client_id=client_id, job_id=job_id,
+                debug=debug, **ocr_options
+            )
+    except Exception as e:
+        metrics.errors.inc(stage="pages")
+        tracer.annotate(error=str(e))
+        raise RuntimeError(f"PDF processing failed: {e}") from e
+
+    # Write all OCR data to one multi-page DOCX
+    t0 = time.perf_counter()
+    try:
+        with tracer.span("docx"):
+            docx_writer.write_multi_page_ocr_output_to_docx(ocr_results, docx_path)
+    except Exception as e:
+        metrics.errors.inc(stage="docx")
+        tracer.annotate(error=str(e))
+        raise RuntimeError(f"DOCX writing failed: {e}") from e
+    metrics.stage_seconds.observe(time.perf_counter() - t0, stage="docx")
+
+def run_batch_job(job_id, work_dir, documents, ocr_options, client_id=None):
+    """
+    Convert every document of a batch; runs on a background job thread.
+
+    `documents` are the job record's document entries plus each one's local "path" and
+    "sha256". Up to BATCH_DOCUMENTS_IN_FLIGHT documents are converted at once; their pages go
+    through the same worker pool and scheduler as single uploads, so small documents keep the
+    warm workers busy instead of waiting for each other. Every DOCX is added to the document
+    cache and to one output.zip. The job fails only if no document could be converted.
+    """
+    lock = threading.Lock()
+    output_dir = os.path.join(work_dir, "outputs")
+    os.makedirs(output_dir, exist_ok=True)
+
+    def publish():
+        # Caller holds the lock
+        jobs.registry.update(job_id, documents=[
+            {k: v for k, v in doc.items() if k not in ("path", "sha256")} for doc in documents])
+
+    def convert_document(doc):
+        if doc["state"] != jobs.QUEUED:
+            return  # Cache hit or unreadable, settled at upload
+        with lock:
+            doc["state"] = jobs.RUNNING
+            publish()
+        record_page = page_recorder(job_id, document=doc["index"])
+
+        def on_page(page_number, result):
+            record_page(page_number, result)
+            with lock:
+                doc["pages_done"] += 1
+                publish()
+
+        docx_path = os.path.join(output_dir, doc["output"])
+        try:
+            convert_pdf(job_id, doc["path"], docx_path, doc["pages_total"], ocr_options, client_id, on_page=on_page)
+        except Exception as e:
+            print(f"[job] {job_id}: {doc['name']} failed: {e}")
+            with lock:
+                doc.update(state=jobs.FAILED, error=str(e))
+                publish()
+            return
+        cache.document_cache.store_file(document_cache_key(doc["sha256"], ocr_options), docx_path)
+        with lock:
+            doc["state"] = jobs.DONE
+            publish()
+
+    try:
+        with ThreadPoolExecutor(max_workers=BATCH_DOCUMENTS_IN_FLIGHT, thread_name_prefix="batch") as pool:
+            list(pool.map(convert_document, documents))
+
+        done = [doc for doc in documents if doc["state"] == jobs.DONE]
+        if not done:
+            raise RuntimeError("No document of the batch could be converted")
+
+        # DOCX files are already compressed, so they are stored as they are
+        zip_path = os.path.join(work_dir, "output.zip")
+        with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_STORED) as zf:
+            for doc in done:
+                zf.write(os.path.join(output_dir, doc["output"]), doc["output"])
+        storage.get_storage().put_file(batch_output_key(job_id), zip_path)
+        jobs.registry.update(job_id, documents_done=len(done), documents_failed=len(documents) - len(done))
+    finally:
+        scheduler.scheduler.finish(job_id)
+        store.finish(job_id)
+
+async def save_upload(file, dest_path, max_bytes=MAX_UPLOAD_BYTES):
+    """
+    Copy an upload to disk in UPLOAD_CHUNK_SIZE chunks, hashing it on the way.
+
+    Raises HTTPException(413) as soon as more than max_bytes have been read; the partial file
+    is removed. Returns the SHA-256 hex digest of the upload. By now the form is already
+    spooled, so this only protects the job folder; reject_large_uploads turns oversized
+    requests away before that.
+    """
+    if file.size is not None and file.size > max_bytes:
+        metrics.errors.inc(stage="upload")
+        raise HTTPException(status_code=413, detail=f"File larger than {max_bytes} bytes")
+
+    sha256 = hashlib.sha256()
+    size = 0
+    try:
+        with open(dest_path, "wb") as f:
+            while True:
+                chunk = await file.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    metrics.errors.inc(stage="upload")
+                    raise HTTPException(status_code=413, detail=f"File larger than {max_bytes} bytes")
+                sha256.update(chunk)
+                f.write(chunk)
+    except BaseException:
+        if os.path.exists(dest_path):
+            os.remove(dest_path)
+        raise
+    return sha256.hexdigest()
+
+def finish_from_cache(job_id, cached_path, work_dir):
+    """Complete a job with a DOCX from the document cache, without running it."""
+    docx_path = os.path.join(work_dir, "output.docx")
+    shutil.copyfile(cached_path, docx_path)
+    storage.get_storage().put_file(output_key(job_id), docx_path)
+    jobs.registry.create(job_id, state=jobs.DONE, cache_hit=True, finished_at=time.time())
+    store.finish(job_id)
+
+def document_cache_key(pdf_sha256, ocr_options):
+    return cache.document_key(pdf_sha256, {
+        "dpi": DPI,
+        "text_layer": workers.USE_TEXT_LAYER,
+        "min_text_layer_words": workers.MIN_TEXT_LAYER_WORDS,
+        "ocr_backend": ocr_engine.resolve_backend(),
+        "ocr_lang": ocr_engine.OCR_LANG,
+        **ocr_options,
+    })
+
+def client_id(request):
+    """Who a request is scheduled for: the X-Client-ID header if sent, else the client address."""
+    return request.headers.get("x-client-id") or (request.client.host if request.client else "unknown")
+
+def overloaded(e):
+    return HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
+def unique_name(name, used):
+    """`name` made unique within the set `used` (which it is added to): report.pdf, report_2.pdf, ..."""
+    stem, ext = os.path.splitext(name)
+    candidate, n = name, 1
+    while candidate.lower() in used:
+        n += 1
+        candidate = f"{stem}_{n}{ext}"
+    used.add(candidate.lower())
+    return candidate
+
+def extract_zip_pdfs(zip_path, dest_dir, used, max_bytes, max_documents):
+    """
+    Extract the PDFs of a ZIP archive into dest_dir, flattened to unique file names; other
+    members (folders, non-PDFs, macOS metadata) are skipped.
+
+    Sizes are counted while extracting, not taken from the archive's headers. Raises
+    HTTPException(413) once more than max_bytes or max_documents PDFs come out, and (400) for
+    an unreadable archive. Returns [(name, path, size, sha256)].
+    """
+    extracted = []
+    total = 0
+    try:
+        with zipfile.ZipFile(zip_path) as zf:
+            for member in zf.infolist():
+                base = os.path.basename(member.filename)
+                if member.is_dir() or member.filename.startswith("__MACOSX/") or base.startswith("._") \
+                        or not base.lower().endswith(".pdf"):
+                    continue
+                if len(extracted) >= max_documents:
+                    raise HTTPException(status_code=413, detail=f"{os.path.basename(zip_path)} holds more than the "
+                                                                f"{max_documents} documents left in the batch")
+
+                name = unique_name(base, used)
+                path = os.path.join(dest_dir, name)
+                sha256 = hashlib.sha256()
+                size = 0
+                with zf.open(member) as src, open(path, "wb") as dst:
+                    while True:
+                        chunk = src.read(UPLOAD_CHUNK_SIZE)
+                        if not chunk:
+                            break
+                        size += len(chunk)
+                        if total + size > max_bytes:
+                            raise HTTPException(status_code=413, detail=f"PDFs in {os.path.basename(zip_path)} exceed "
+                                                                        f"the {max_bytes} bytes left in the batch")
+                        sha256.update(chunk)
+                        dst.write(chunk)
+                total += size
+                extracted.append((name, path, size, sha256.hexdigest()))
+    except (zipfile.BadZipFile, zipfile.LargeZipFile, NotImplementedError) as e:
+        metrics.errors.inc(stage="upload")
+        raise HTTPException(status_code=400, detail=f"Could not read {os.path.basename(zip_path)}: {e}")
+    except HTTPException:
+        metrics.errors.inc(stage="upload")
+        raise
+    return extracted
+
+def inspect_document(doc, ocr_options, output_dir):
+    """
+    Settle what can be settled for a batch document before it is queued: serve it from the
+    document cache (copied to output_dir) or read its page count. Unreadable PDFs are marked
+    failed instead of turning the whole batch away.
+    """
+    cached_path = cache.document_cache.lookup(document_cache_key(doc["sha256"], ocr_options))
+    if cached_path is not None:
+        try:
+            shutil.copyfile(cached_path, os.path.join(output_dir, doc["output"]))
+        except FileNotFoundError:
+            pass  # Evicted meanwhile, convert it after all
+        else:
+            doc.update(state=jobs.DONE, cache_hit=True)
+            return
+    try:
+        doc["pages_total"] = pdf_to_png.get_page_count(doc["path"])
+    except Exception as e:
+        doc.update(state=jobs.FAILED, error=f"Could not read the PDF: {e}")
 
 @app.post("/process/")
 async def process_pdf(
+    request: Request,
     file: UploadFile = File(...),
     debug: bool = Query(False, description="Enable debug mode"),
     use_hough: bool = Query(False, description="Enable Hough transform fallback"),
+    trace: bool = Query(False, description="Write a trace bundle for this job"),
 ):
+    # Turn uploads away before reading them while the backlog is already full
+    try:
+        scheduler.scheduler.admit(None, 0)
+    except scheduler.Overloaded as e:
+        raise overloaded(e)
+
+    # Make room for the upload first; finished jobs are evicted if the disk budget requires it
+    if not store.ensure_space(file.size or 0):
+        raise HTTPException(status_code=507, detail="Job storage is full, try again later")
+
     # Create unique job directory
     job_id = str(uuid.uuid4())
-    work_dir = os.path.join(TEMP_DIR, job_id)
-    os.makedirs(work_dir, exist_ok=True)
+    work_dir = store.create(job_id)
 
-    pdf_path = os.path.join(work_dir, file.filename)
-    with open(pdf_path, "wb") as f:
-        f.write(await file.read())
+    pdf_path = os.path.join(work_dir, os.path.basename(file.filename or "upload.pdf"))
+    try:
+        pdf_sha256 = await save_upload(file, pdf_path)
+    except BaseException:
+        store.remove(job_id)
+        raise
+    store.set_size(job_id, os.path.getsize(pdf_path))
 
-    # Convert PDF to PNG images
+    ocr_options = workers.default_ocr_options(use_hough=use_hough)
+
+    # Same PDF with the same parameters: serve the DOCX from the cache (debug runs always recompute)
+    document_key = None
+    if not debug:
+        document_key = document_cache_key(pdf_sha256, ocr_options)
+        cached_path = cache.document_cache.lookup(document_key)
+        if cached_path is not None:
+            await asyncio.to_thread(finish_from_cache, job_id, cached_path, work_dir)
+            return {
+                "message": "Processing complete (cached)",
+                "job_id": job_id,
+                "status_url": f"/status/{job_id}",
+                "download_url": f"/download/{job_id}"
+            }
+    # Admission is weighed by page count
     try:
-        png_paths = pdf_to_png.convert_pdf_to_png(pdf_path, output_folder=work_dir)
+        page_count = await asyncio.to_thread(pdf_to_png.get_page_count, pdf_path)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"PDF to PNG conversion failed: {e}")
+        store.remove(job_id)
+        raise HTTPException(status_code=400, detail=f"Could not read the PDF: {e}")
+    try:
+        scheduler.scheduler.admit(job_id, page_count)
+    except scheduler.Overloaded as e:
+        store.remove(job_id)
+        raise overloaded(e)
 
-    ocr_results = []
-    for png_path in png_paths:
-        # Open image for OCR
-        image_pil = Image.open(png_path)
+    # Debug runs are always traced, with every debug image kept
+    trace = tracing.should_trace(trace or debug)
 
-        # Extract OCR data (supporting Hough fallback)
-        ocr_data = png_ocr.extract_structured_data(image_pil, debug=debug, use_hough=use_hough)
-        ocr_results.append(ocr_data)
+    # Queue the job and return right away; progress is reported by /status/{job_id}
+    # Off the event loop: the new job record is written to the storage
+    await asyncio.to_thread(
+        jobs.submit, job_id, run_pdf_job, pdf_path, work_dir, ocr_options, debug=debug,
+        document_key=document_key, trace=trace, page_count=page_count, client_id=client_id(request),
+        job_fields={"traced": trace})
 
-    # Write all OCR data to one multi-page DOCX
-    docx_path = os.path.join(work_dir, "output.docx")
+    response = {
+        "message": "Processing started",
+        "job_id": job_id,
+        "status_url": f"/status/{job_id}",
+        "stream_url": f"/stream/{job_id}",
+        "download_url": f"/download/{job_id}"
+    }
+    if trace:
+        response["trace_url"] = f"/trace/{job_id}"
+    return response
+
+@app.post("/batch/")
+async def process_batch(
+    request: Request,
+    files: List[UploadFile] = File(..., description="PDF files and/or ZIP archives of PDFs"),
+    use_hough: bool = Query(False, description="Enable Hough transform fallback"),
+):
+    """
+    Convert many PDFs in one job: upload any mix of PDF files and ZIP archives of PDFs (up to
+    MAX_BATCH_DOCUMENTS documents and MAX_BATCH_BYTES in total). /status/{job_id} reports
+    every document's state, /stream/{job_id} tags each page result with its document index,
+    and /download/{job_id} returns a ZIP with one DOCX per converted document.
+    """
     try:
-        docx_writer.write_multi_page_ocr_output_to_docx(ocr_results, docx_path)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"DOCX writing failed: {e}")
+        scheduler.scheduler.admit(None, 0)
+    except scheduler.Overloaded as e:
+        raise overloaded(e)
+
+    if not store.ensure_space(sum(file.size or 0 for file in files)):
+        raise HTTPException(status_code=507, detail="Job storage is full, try again later")
+
+    job_id = str(uuid.uuid4())
+    work_dir = store.create(job_id)
+    input_dir = os.path.join(work_dir, "inputs")
+    output_dir = os.path.join(work_dir, "outputs")
+    os.makedirs(input_dir)
+    os.makedirs(output_dir)
+
+    # Save the uploads, unpacking ZIP archives, within one byte budget for the whole batch
+    saved = []  # (name, path, size, sha256)
+    used = set()
+    total = 0
+    try:
+        for file in files:
+            base = os.path.basename(file.filename or "upload.pdf")
+            if base.lower().endswith(".zip"):
+                zip_path = os.path.join(work_dir, unique_name(base, used))
+                await save_upload(file, zip_path, max_bytes=MAX_BATCH_BYTES - total)
+                extracted = await asyncio.to_thread(
+                    extract_zip_pdfs, zip_path, input_dir, used, MAX_BATCH_BYTES - total,
+                    MAX_BATCH_DOCUMENTS - len(saved))
+                os.remove(zip_path)
+            else:
+                if len(saved) >= MAX_BATCH_DOCUMENTS:
+                    metrics.errors.inc(stage="upload")
+                    raise HTTPException(status_code=413, detail=f"More than {MAX_BATCH_DOCUMENTS} documents")
+                name = unique_name(base, used)
+                path = os.path.join(input_dir, name)
+                sha256 = await save_upload(file, path, max_bytes=min(MAX_UPLOAD_BYTES, MAX_BATCH_BYTES - total))
+                extracted = [(name, path, os.path.getsize(path), sha256)]
+            saved.extend(extracted)
+            total += sum(size for _, _, size, _ in extracted)
+    except BaseException:
+        store.remove(job_id)
+        raise
+    if not saved:
+        store.remove(job_id)
+        raise HTTPException(status_code=400, detail="No PDF in the upload")
+    store.set_size(job_id, total)
+
+    # Cache hits and page counts, read for all documents side by side
+    ocr_options = workers.default_ocr_options(use_hough=use_hough)
+    outputs = set()
+    documents = [{
+        "index": index,
+        "name": name,
+        "output": unique_name(os.path.splitext(name)[0] + ".docx", outputs),
+        "state": jobs.QUEUED,
+        "pages_total": None,
+        "pages_done": 0,
+        "cache_hit": False,
+        "error": None,
+        "path": path,
+        "sha256": sha256,
+    } for index, (name, path, _, sha256) in enumerate(saved)]
+    errors = await asyncio.gather(*(asyncio.to_thread(inspect_document, doc, ocr_options, output_dir)
+                                    for doc in documents), return_exceptions=True)
+    failed = [(doc, e) for doc, e in zip(documents, errors) if isinstance(e, Exception)]
+    if failed:
+        store.remove(job_id)
+        metrics.errors.inc(stage="upload")
+        doc, e = failed[0]
+        raise HTTPException(status_code=400, detail=f"Could not read {doc['name']}: {e}")
+
+    # Admission is weighed by the pages that still need OCR
+    page_count = sum(doc["pages_total"] for doc in documents if doc["state"] == jobs.QUEUED)
+    try:
+        scheduler.scheduler.admit(job_id, page_count)
+    except scheduler.Overloaded as e:
+        store.remove(job_id)
+        raise overloaded(e)
+
+    public = [{k: v for k, v in doc.items() if k not in ("path", "sha256")} for doc in documents]
+    await asyncio.to_thread(
+        jobs.submit, job_id, run_batch_job, work_dir, documents, ocr_options, client_id=client_id(request),
+        job_fields={"kind": "batch", "documents": public, "pages_total": page_count})
 
     return {
-        "message": "Processing complete",
+        "message": "Processing started",
         "job_id": job_id,
+        "documents": len(documents),
+        "pages_total": page_count,
+        "status_url": f"/status/{job_id}",
+        "stream_url": f"/stream/{job_id}",
         "download_url": f"/download/{job_id}"
     }
 
+# Plain def: looking up another instance's job reads the storage, so it runs on the threadpool
+@app.get("/status/{job_id}")
+def job_status(job_id: str):
+    job = jobs.registry.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job["state"] == jobs.DONE:
+        job["download_url"] = f"/download/{job_id}"
+    return job
+
+@app.get("/stream/{job_id}")
+async def stream_job(job_id: str):
+    """
+    NDJSON stream of a job's results: one {"event": "page", ...} line per page as soon as it
+    is done (tables, cell boxes, timings), then one {"event": "done"} line with the download
+    URL, or {"event": "failed"} with the error.
+    """
+    # Jobs of other instances are read from the storage, so every lookup runs off the event loop
+    if await asyncio.to_thread(jobs.registry.get, job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    async def events():
+        sent = 0
+        while True:
+            # Read the state before the results: a finished job has all its pages recorded
+            job = await asyncio.to_thread(jobs.registry.get, job_id)
+            if job is None:
+                return
+            for page_number, result in await asyncio.to_thread(jobs.registry.page_results, job_id, sent):
+                sent += 1
+                line = {"event": "page", "page": page_number, "pages_total": job["pages_total"], "result": result}
+                yield json.dumps(line, default=cache.json_default) + "\n"
+
+            if job["state"] == jobs.DONE:
+                yield json.dumps({"event": "done", "job_id": job_id, "download_url": f"/download/{job_id}"}) + "\n"
+                return
+            if job["state"] == jobs.FAILED:
+                yield json.dumps({"event": "failed", "job_id": job_id, "error": job["error"]}) + "\n"
+                return
+            await asyncio.sleep(STREAM_POLL_SECONDS)
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+@app.get("/cache/stats")
+async def cache_stats():
+    return {
+        "documents": cache.document_cache.stats(),
+        "pages": cache.page_cache.stats(),
+        "jobs": store.stats(),
+        "scheduler": scheduler.scheduler.stats(),
+    }
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    return Response(content=metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+@app.get("/trace/{job_id}")
+def download_trace(job_id: str):
+    """
+    ZIP of a job's trace bundle: job.json and one page_NNN.json span tree per page, plus the
+    sampled debug images under images/. Served from the storage, where the bundle is uploaded
+    when the job ends; with the local backend, files written so far show up while it runs.
+    """
+    prefix = f"{os.path.basename(job_id)}/trace/"
+    backend = storage.get_storage()
+    keys = backend.list(prefix)
+    if not keys:
+        raise HTTPException(status_code=404, detail="No trace for this job")
+
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as zf:
+        for key in keys:
+            data = backend.get_bytes(key)
+            if data is not None:  # Removed meanwhile
+                zf.writestr(key[len(prefix):], data)
+    return Response(content=buffer.getvalue(), media_type="application/zip",
+                    headers={"Content-Disposition": f'attachment; filename="trace_{job_id}.zip"'})
+
 @app.get("/download/{job_id}")
-async def download_docx(job_id: str):
-    docx_path = os.path.join(TEMP_DIR, job_id, "output.docx")
-    if not os.path.exists(docx_path):
+def download_docx(job_id: str):
+    """The job's DOCX, or for a batch job the ZIP of its DOCX files."""
+    job = jobs.registry.get(job_id)
+    if job is not None and job["state"] != jobs.DONE:
+        raise HTTPException(status_code=409, detail=f"Job is {job['state']}")
+
+    if job is not None and job.get("kind") == "batch":
+        key, filename, media_type = batch_output_key(os.path.basename(job_id)), "output.zip", ZIP_MEDIA_TYPE
+    else:
+        key, filename, media_type = output_key(os.path.basename(job_id)), "output.docx", DOCX_MEDIA_TYPE
+
+    # Served from the shared storage, so any instance can answer
+    backend = storage.get_storage()
+    local_path = backend.local_path(key)
+    if local_path is not None:
+        return FileResponse(path=local_path, filename=filename, media_type=media_type)
+
+    size = backend.size(key)
+    if size is None:
         raise HTTPException(status_code=404, detail="File not found")
-    return FileResponse(path=docx_path, filename="output.docx", media_type="application/vnd.openxmlformats-officedocument.wordprocessingml.document")
+    return StreamingResponse(backend.iter_chunks(key), media_type=media_type, headers={
+        "Content-Disposition": f'attachment; filename="{filename}"',
+        "Content-Length": str(size),
+    })
@@ -0,0 +1,167 @@
+import bisect
+import threading
+
+# Latency buckets in seconds, from a cached page (ms) up to a long document (minutes)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+_metrics = []
+
+
+def _format_labels(labelnames, values, extra=()):
+    pairs = list(zip(labelnames, values)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        _metrics.append(self)
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    """Monotonically increasing count, optionally split by labels."""
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values = {}
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _samples(self):
+        with self._lock:
+            values = dict(self._values)
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(v)}" for key, v in values.items()]
+
+
+class Gauge(_Metric):
+    """
+    Value that can go up and down. With `fn`, the value is computed by calling fn() at scrape
+    time instead, so nothing is recorded on the hot path.
+    """
+    kind = "gauge"
+
+    def __init__(self, name, documentation, labelnames=(), fn=None):
+        super().__init__(name, documentation, labelnames)
+        self._values = {}
+        self._fn = fn
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def _samples(self):
+        if self._fn is not None:
+            try:
+                return [f"{self.name} {_format_value(self._fn())}"]
+            except Exception as e:
+                print(f"[metrics] {self.name} failed: {e}")
+                return []
+        with self._lock:
+            values = dict(self._values)
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(v)}" for key, v in values.items()]
+
+
+class Histogram(_Metric):
+    """Distribution of observed values in cumulative buckets, plus their sum and count."""
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}  # key -> [bucket counts..., +Inf count, sum]
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._values.get(key)
+            if counts is None:
+                counts = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            counts[i] += 1
+            counts[-1] += value
+
+    def _samples(self):
+        with self._lock:
+            values = {key: list(counts) for key, counts in self._values.items()}
+
+        lines = []
+        for key, counts in values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts[:-1]):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, [("le", _format_value(bound))])
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(counts[-1])}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+def render():
+    """All metrics in the Prometheus text exposition format."""
+    return "\n".join(metric.render() for metric in _metrics) + "\n"
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+stage_seconds = Histogram("pdeffer_stage_seconds", "Time spent per pipeline stage", ["stage"])
+pages_processed = Counter("pdeffer_pages_processed_total", "Pages processed", ["source"])
+cells_processed = Counter("pdeffer_cells_processed_total", "Table cells detected")
+blank_cells_skipped = Counter("pdeffer_blank_cells_skipped_total", "Cells skipped as blank without OCR")
+ocr_calls = Counter("pdeffer_ocr_calls_total", "OCR engine invocations")
+tables_rejected = Counter("pdeffer_table_candidates_rejected_total", "Table candidate regions dropped before OCR")
+hough_fallbacks = Counter("pdeffer_hough_fallbacks_total", "Low-confidence pages double-checked with the Hough detector")
+jobs_finished = Counter("pdeffer_jobs_total", "Finished jobs", ["state"])
+errors = Counter("pdeffer_errors_total", "Errors", ["stage"])
+
+
+def record_page(result):
+    """Record the metrics of one page result from png_ocr.extract_structured_data / workers."""
+    for stage, seconds in result.get("timings", {}).items():
+        stage_seconds.observe(seconds, stage=stage)
+
+    # Cached pages count once as such; the OCR work in their stats was done (and counted) before
+    source = "cache" if result.get("cache_hit") else result.get("text_source", "ocr")
+    pages_processed.inc(source=source)
+
+    stats = result.get("stats", {})
+    cells_processed.inc(stats.get("cells", 0))
+    if source != "cache":
+        blank_cells_skipped.inc(stats.get("blank_cells_skipped", 0))
+        ocr_calls.inc(stats.get("ocr_calls", 0))
+        tables_rejected.inc(stats.get("tables_rejected", 0))
+        hough_fallbacks.inc(stats.get("hough_fallback", 0))
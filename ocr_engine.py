@@ -0,0 +1,244 @@
+import os
+import queue
+import threading
+from contextlib import contextmanager
+
+import pytesseract
+
+try:
+    import tesserocr
+except ImportError:  # Optional dependency, pytesseract is used instead
+    tesserocr = None
+
+OCR_BACKEND = os.environ.get("PDEFFER_OCR_BACKEND", "auto")  # "auto", "tesserocr" or "pytesseract"
+OCR_LANG = os.environ.get("PDEFFER_OCR_LANG", "eng")
+OCR_POOL_SIZE = int(os.environ.get("PDEFFER_OCR_POOL_SIZE", os.cpu_count() or 1))
+
+
+class PytesseractEngine:
+    """
+    Fallback backend: every call launches a `tesseract` process through pytesseract.
+    """
+    name = "pytesseract"
+
+    def __init__(self, lang=OCR_LANG, oem=3):
+        self.lang = lang
+        self.oem = oem
+
+    def image_to_string(self, image_gray, psm=6):
+        config = f"--oem {self.oem} --psm {psm}"
+        return pytesseract.image_to_string(image_gray, lang=self.lang, config=config)
+
+    def image_to_words(self, image_gray, psm=11):
+        config = f"--oem {self.oem} --psm {psm}"
+        data = pytesseract.image_to_data(
+            image_gray, lang=self.lang, config=config, output_type=pytesseract.Output.DICT
+        )
+
+        words = []
+        for i, text in enumerate(data["text"]):
+            text = text.strip()
+            if not text or float(data["conf"][i]) < 0:
+                continue
+            left, top = data["left"][i], data["top"][i]
+            words.append({
+                "text": text,
+                "left": left,
+                "top": top,
+                "right": left + data["width"][i],
+                "bottom": top + data["height"][i],
+                "conf": float(data["conf"][i]),
+                "line": (data["block_num"][i], data["par_num"][i], data["line_num"][i]),
+            })
+        return words
+
+    def close(self):
+        pass
+
+
+class TesserocrEngine:
+    """
+    In-process backend on top of the libtesseract C API (tesserocr).
+
+    The language model is loaded once when the engine is created; after that a call only
+    costs the recognition itself.
+    """
+    name = "tesserocr"
+
+    def __init__(self, lang=OCR_LANG, oem=3):
+        self.api = tesserocr.PyTessBaseAPI(lang=lang, oem=oem)
+
+    def _set_image(self, image_gray, psm):
+        h, w = image_gray.shape[:2]
+        self.api.SetPageSegMode(psm)
+        self.api.SetImageBytes(image_gray.tobytes(), w, h, 1, w)
+
+    def image_to_string(self, image_gray, psm=6):
+        self._set_image(image_gray, psm)
+        return self.api.GetUTF8Text()
+
+    def image_to_words(self, image_gray, psm=11):
+        self._set_image(image_gray, psm)
+        self.api.Recognize()
+
+        iterator = self.api.GetIterator()
+        if iterator is None:
+            return []
+
+        RIL = tesserocr.RIL
+        words = []
+        block = par = line = 0
+        for r in tesserocr.iterate_level(iterator, RIL.WORD):
+            if r.IsAtBeginningOf(RIL.BLOCK):
+                block += 1
+            if r.IsAtBeginningOf(RIL.PARA):
+                par += 1
+            if r.IsAtBeginningOf(RIL.TEXTLINE):
+                line += 1
+
+            text = (r.GetUTF8Text(RIL.WORD) or "").strip()
+            box = r.BoundingBox(RIL.WORD)
+            if not text or box is None:
+                continue
+            left, top, right, bottom = box
+            words.append({
+                "text": text,
+                "left": left,
+                "top": top,
+                "right": right,
+                "bottom": bottom,
+                "conf": float(r.Confidence(RIL.WORD)),
+                "line": (block, par, line),
+            })
+        return words
+
+    def close(self):
+        self.api.End()
+
+
+def create_engine(backend=OCR_BACKEND, lang=OCR_LANG):
+    """
+    Create one OCR engine of the backend resolve_backend(backend, lang) picks.
+    """
+    if resolve_backend(backend, lang) == "tesserocr":
+        return TesserocrEngine(lang=lang)
+    return PytesseractEngine(lang=lang)
+
+
+_resolved = {}
+_resolved_lock = threading.Lock()
+
+
+def resolve_backend(backend=OCR_BACKEND, lang=OCR_LANG):
+    """
+    Name of the backend that actually runs for a configured `backend` ("tesserocr" or
+    "pytesseract"), e.g. for cache keys. "auto" prefers tesserocr and falls back to
+    pytesseract when the binding is not installed or cannot load the language data.
+
+    Checked once per process and backend/lang pair.
+    """
+    with _resolved_lock:
+        if (backend, lang) not in _resolved:
+            _resolved[(backend, lang)] = _resolve_backend(backend, lang)
+        return _resolved[(backend, lang)]
+
+
+def _resolve_backend(backend, lang):
+    if backend in ("auto", "tesserocr") and tesserocr is not None:
+        try:
+            # Loading the language data is what fails when tesserocr can't be used
+            tesserocr.PyTessBaseAPI(lang=lang).End()
+            return "tesserocr"
+        except RuntimeError as e:
+            if backend == "tesserocr":
+                raise
+            print(f"[OCR] tesserocr unavailable ({e}), falling back to pytesseract")
+    elif backend == "tesserocr":
+        raise RuntimeError("PDEFFER_OCR_BACKEND=tesserocr but tesserocr is not installed")
+    return "pytesseract"
+
+
+class EnginePool:
+    """
+    Keeps initialized OCR engines alive and hands them out to callers one at a time.
+
+    Engines are created lazily, up to `size`, so a single-threaded worker process only ever
+    loads one model. Callers block while all engines are busy.
+    """
+
+    def __init__(self, size=OCR_POOL_SIZE, backend=OCR_BACKEND, lang=OCR_LANG):
+        self.size = max(1, size)
+        self.backend = backend
+        self.lang = lang
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def acquire(self):
+        engine = None
+        try:
+            engine = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                if self._created < self.size:
+                    self._created += 1
+                    try:
+                        engine = create_engine(self.backend, self.lang)
+                    except Exception:
+                        self._created -= 1
+                        raise
+            if engine is None:
+                engine = self._idle.get()
+
+        try:
+            yield engine
+        finally:
+            self._idle.put(engine)
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+        with self._lock:
+            self._created = 0
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def init_pool(size=OCR_POOL_SIZE, backend=OCR_BACKEND, lang=OCR_LANG, warm=False):
+    """
+    (Re)create the process-wide engine pool, e.g. with size=1 in a single-threaded worker
+    process. With warm=True one engine is created right away so the model is loaded before
+    the first page arrives.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+        _pool = EnginePool(size=size, backend=backend, lang=lang)
+    if warm:
+        with _pool.acquire():
+            pass
+    return _pool
+
+
+def get_pool():
+    """Return the process-wide engine pool, creating it on first use."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = EnginePool()
+    return _pool
+
+
+@contextmanager
+def engine():
+    """Borrow an engine from the process-wide pool."""
+    with get_pool().acquire() as ocr:
+        yield ocr
@@ -1,6 +1,144 @@
 import os
-from pdf2image import convert_from_path
-import pdf_to_png
+import subprocess
+import time
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+from pdf2image import convert_from_path, pdfinfo_from_path
+
+# Single background thread for archival PNG writes, so PNG encoding never blocks the OCR path
+_archive_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="png-archive")
+# How long wait_for_archives waits for pending archive writes at the end of a job, in seconds
+ARCHIVE_TIMEOUT = 60
+
+
+def get_page_count(pdf_path):
+    """
+    Returns the number of pages in a PDF file (read with poppler's pdfinfo).
+    """
+    info = pdfinfo_from_path(pdf_path)
+    return int(info["Pages"])
+
+
+def iter_pdf_pages(pdf_path, dpi=300, first_page=1, last_page=None, pages_per_render=1):
+    """
+    Renders a PDF lazily and yields its pages one at a time.
+
+    Only `pages_per_render` pages are rasterized per pdftoppm call, so peak memory is bounded by
+    a few pages instead of the whole document, and callers can start processing the first page
+    while the rest of the document has not been rendered yet.
+
+    Parameters:
+    - pdf_path (str): Path to the input PDF file.
+    - dpi (int): Resolution of the rendered pages.
+    - first_page (int): First page to render (1-based).
+    - last_page (int): Last page to render (inclusive). Defaults to the last page of the PDF.
+    - pages_per_render (int): Number of pages rendered per pdftoppm call.
+
+    Yields:
+    - (page_number, page) tuples, where page_number is 1-based and page is a PIL image.
+    """
+    if last_page is None:
+        last_page = get_page_count(pdf_path)
+
+    for chunk_start in range(first_page, last_page + 1, pages_per_render):
+        chunk_end = min(chunk_start + pages_per_render - 1, last_page)
+        pages = convert_from_path(pdf_path, dpi=dpi, first_page=chunk_start, last_page=chunk_end)
+        for offset, page in enumerate(pages):
+            yield chunk_start + offset, page
+        del pages  # Drop the chunk before the next one is rendered
+
+
+def extract_text_words(pdf_path, page_number, dpi=300):
+    """
+    Reads the embedded text layer of one PDF page with poppler's `pdftotext -bbox-layout`.
+
+    Parameters:
+    - pdf_path (str): Path to the input PDF file.
+    - page_number (int): Page to read (1-based).
+    - dpi (int): Resolution the word boxes are converted to, so they line up with a page
+      rendered by iter_pdf_pages at the same dpi.
+
+    Returns:
+    - List of words in the same format as png_ocr.ocr_words (text, left, top, right, bottom,
+      conf, line). Empty for scanned pages, or when pdftotext is not available.
+    """
+    try:
+        proc = subprocess.run(
+            ["pdftotext", "-f", str(page_number), "-l", str(page_number), "-bbox-layout", pdf_path, "-"],
+            capture_output=True, check=True, timeout=60,
+        )
+        root = ET.fromstring(proc.stdout)
+    except (OSError, subprocess.SubprocessError, ET.ParseError) as e:
+        print(f"[text layer] pdftotext failed on page {page_number}: {e}")
+        return []
+
+    scale = dpi / 72.0  # PDF points -> pixels
+    words = []
+    line_index = 0
+    for element in root.iter():
+        tag = element.tag.rsplit("}", 1)[-1]  # Strip the XHTML namespace
+        if tag == "line":
+            line_index += 1
+        elif tag == "word":
+            text = (element.text or "").strip()
+            if not text:
+                continue
+            words.append({
+                "text": text,
+                "left": int(float(element.get("xMin")) * scale),
+                "top": int(float(element.get("yMin")) * scale),
+                "right": int(float(element.get("xMax")) * scale),
+                "bottom": int(float(element.get("yMax")) * scale),
+                "conf": 100.0,
+                "line": (0, 0, line_index),
+            })
+    return words
+
+
+def archive_page(page, output_path):
+    """
+    Saves a rendered page as PNG on a background thread.
+
+    The PNG is written to a temporary file and renamed, so a file at output_path is always
+    complete; wait_for_archives() relies on that to wait for pages archived by other processes.
+
+    Parameters:
+    - page (PIL.Image.Image): Rendered page. It must not be modified after this call.
+    - output_path (str): Destination PNG path.
+
+    Returns:
+    - concurrent.futures.Future that resolves to output_path once the file is written.
+    """
+    def _save():
+        tmp_path = f"{output_path}.{os.getpid()}.tmp"
+        try:
+            page.save(tmp_path, "PNG")
+            os.replace(tmp_path, output_path)
+        except Exception as e:
+            print(f"[archive] Failed to write {output_path}: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return output_path
+
+    return _archive_executor.submit(_save)
+
+
+def wait_for_archives(paths, timeout=ARCHIVE_TIMEOUT, poll_interval=0.05):
+    """
+    Waits until every file in `paths` has been written, e.g. the PNGs of archive_page,
+    possibly by another process (a page worker).
+
+    Returns:
+    - List of the paths still missing after `timeout` seconds.
+    """
+    deadline = time.monotonic() + timeout
+    missing = [path for path in paths if not os.path.exists(path)]
+    while missing and time.monotonic() < deadline:
+        time.sleep(poll_interval)
+        missing = [path for path in missing if not os.path.exists(path)]
+    return missing
+
 
 def convert_pdf_to_png(pdf_path, output_folder="output_pages", dpi=300):
     """
@@ -16,12 +154,10 @@ def convert_pdf_to_png(pdf_path, output_folder="output_pages", dpi=300):
     """
     os.makedirs(output_folder, exist_ok=True)  # Ensure output directory exists
 
-    pages = convert_from_path(pdf_path, dpi=dpi)  # Convert PDF pages to PIL images
-
     output_paths = []
-    for i, page in enumerate(pages):
+    for page_number, page in iter_pdf_pages(pdf_path, dpi=dpi):
         # Create output file name for each page (e.g., page_001.png)
-        output_path = os.path.join(output_folder, f"page_{i + 1:03d}.png")
+        output_path = os.path.join(output_folder, f"page_{page_number:03d}.png")
         page.save(output_path, "PNG")  # Save image as PNG
         output_paths.append(output_path)
         print(f"Saved: {output_path}")  # Feedback for each saved file
@@ -40,4 +176,4 @@ if __name__ == "__main__":
         print("Usage: python pdf_to_png.py input_file.pdf")
     else:
         pdf_path = sys.argv[1]
-        pdf_to_png(pdf_path)  # Run the conversion function
+        convert_pdf_to_png(pdf_path)  # Run the conversion function
@@ -1,223 +1,432 @@
+import threading
+import time
 import cv2
 import numpy as np
-import pytesseract
 from PIL import Image
+import ocr_engine
+import tracing
 
 
-def estimate_line_thickness(lines_img, axis='horizontal'):
+def to_bgr_array(image):
     """
-    Estimate median line thickness in pixels from a binary image of lines.
-    axis: 'horizontal' or 'vertical' - affects how we measure thickness.
+    Returns the page as a BGR NumPy array, the layout every OpenCV step in this module expects.
+
+    NumPy arrays are assumed to already be BGR and are returned unchanged. PIL images are
+    copied into a NumPy array once and converted in place, without any PNG encode/decode.
     """
-    # Invert image: lines are white on black
-    inverted = cv2.bitwise_not(lines_img)
+    if isinstance(image, np.ndarray):
+        return image
 
-    # Find contours (connected white blobs)
-    contours, _ = cv2.findContours(inverted, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-    thicknesses = []
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    image_cv = np.array(image)
+    cv2.cvtColor(image_cv, cv2.COLOR_RGB2BGR, dst=image_cv)
+    return image_cv
 
-    for cnt in contours:
-        x, y, w, h = cv2.boundingRect(cnt)
-        # For horizontal lines, thickness is height; for vertical, thickness is width
-        thickness = h if axis == 'horizontal' else w
-        if thickness > 0:
-            thicknesses.append(thickness)
 
-    if not thicknesses:
-        return None  # No lines found
+# Minimum run, in pixels, for a stroke to be kept as a ruling line by the page-level morphology
+LINE_KERNEL_LEN = 40
+# Shortest horizontal/vertical segment kept after the morphology (see filter_short_lines)
+MIN_H_LINE_LEN = 30
+MIN_V_LINE_LEN = 70
+# Table candidates scoring at least TABLE_MIN_SCORE are kept and below TABLE_REJECT_SCORE are
+# dropped; in between the page is uncertain and the Hough detector is asked for a second opinion
+TABLE_MIN_SCORE = 0.6
+TABLE_REJECT_SCORE = 0.2
+# Ratio of ruling-line pixels to all ink pixels from which a region counts as fully ruled
+MIN_LINE_COVERAGE = 0.1
 
-    # Return median thickness as a robust estimate
-    return int(np.median(thicknesses))
-def detect_cells(image_cv, table_box, debug=False):
-    x1, y1, x2, y2 = table_box
-    roi = image_cv[y1:y2, x1:x2]
-    gray = cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY)
-    _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
 
-    scale = 20
-    h_kernel_len = max(10, roi.shape[1] // scale)
-    v_kernel_len = max(10, roi.shape[0] // scale)
+def estimate_line_thickness(lines_img, axis='horizontal'):
+    """
+    Estimate the average line thickness in pixels from a binary image of lines.
+    axis: 'horizontal' or 'vertical' - affects how we measure thickness.
 
-    horizontal_kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (h_kernel_len, 1))
-    vertical_kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (1, v_kernel_len))
+    Thickness is the number of line pixels divided by the number of runs across the lines
+    (top edges for horizontal lines, left edges for vertical ones), so no contour pass is needed.
+    """
+    mask = lines_img > 0
+    if axis != 'horizontal':
+        mask = mask.T
 
-    # Extract horizontal and vertical lines
-    horizontal_lines = cv2.erode(binary, horizontal_kernel, iterations=1)
-    horizontal_lines = cv2.dilate(horizontal_lines, horizontal_kernel, iterations=1)
-    horizontal_lines = filter_short_lines(horizontal_lines, min_len=30, axis='horizontal')
+    total = np.count_nonzero(mask)
+    if total == 0:
+        return None  # No lines found
 
-    vertical_lines = cv2.erode(binary, vertical_kernel, iterations=1)
-    vertical_lines = cv2.dilate(vertical_lines, vertical_kernel, iterations=1)
-    vertical_lines = filter_short_lines(vertical_lines, min_len=70, axis='vertical')
+    runs = np.count_nonzero(mask[0]) + np.count_nonzero(mask[1:] & ~mask[:-1])
+    return max(1, int(round(total / runs)))
 
-    # Estimate line thickness
-    h_thickness = estimate_line_thickness(horizontal_lines, axis='horizontal')
-    v_thickness = estimate_line_thickness(vertical_lines, axis='vertical')
 
-    if debug:
-        print(f"[DEBUG] Estimated horizontal line thickness: {h_thickness}")
-        print(f"[DEBUG] Estimated vertical line thickness: {v_thickness}")
+def filter_short_lines(lines_img, min_len=30, axis='horizontal'):
+    result = np.zeros_like(lines_img)
+    contours, _ = cv2.findContours(lines_img, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
 
-    # Choose minimal thickness as bottleneck
-    if h_thickness is None or v_thickness is None:
-        thickness = 3  # fallback value
-    else:
-        thickness = min(h_thickness, v_thickness)
+    for cnt in contours:
+        x, y, w, h = cv2.boundingRect(cnt)
+        if axis == 'horizontal' and w >= min_len:
+            cv2.drawContours(result, [cnt], -1, 255, -1)
+        elif axis == 'vertical' and h >= min_len:
+            cv2.drawContours(result, [cnt], -1, 255, -1)
 
-    # Adaptive dilation based on thickness
-    if thickness <= 2:
-        dilation_size = 3
-    else:
-        dilation_size = 1
+    return result
 
-    # Apply dilation to binary image to strengthen thin lines
-    dilation_kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (dilation_size, dilation_size))
-    processed_binary = cv2.dilate(binary, dilation_kernel, iterations=1)
 
-    # Recalculate lines on processed image
-    horizontal_lines = cv2.erode(processed_binary, horizontal_kernel, iterations=1)
-    horizontal_lines = cv2.dilate(horizontal_lines, horizontal_kernel, iterations=1)
-    horizontal_lines = filter_short_lines(horizontal_lines, min_len=30, axis='horizontal')
+class PageLines:
+    """
+    Line structure of one page, computed once and shared by table detection, cell detection
+    and OCR preparation.
 
-    vertical_lines = cv2.erode(processed_binary, vertical_kernel, iterations=1)
-    vertical_lines = cv2.dilate(vertical_lines, vertical_kernel, iterations=1)
-    vertical_lines = filter_short_lines(vertical_lines, min_len=70, axis='vertical')
+    Attributes:
+        gray: Grayscale page.
+        binary: Otsu-binarized page, ink is 255.
+        horizontal / vertical: Masks of the horizontal and vertical ruling lines.
 
-    # Get line positions for table grid
-    x_lines = get_line_positions(vertical_lines, axis='vertical', scale=20, tol=5)
-    y_lines = get_line_positions(horizontal_lines, axis='horizontal', scale=20, tol=8)
+    Table regions are read with `table_lines(box)`, which returns views into the page masks.
 
-    if debug:
-        print(f"[DEBUG] Grid lines - X: {len(x_lines)}, Y: {len(y_lines)}")
+    `scale` is the resolution of `image_cv` relative to the full-resolution page (e.g. 0.5 for
+    a half-size detection image); every pixel length used for detection is scaled with it.
+    """
 
-    cells = []
-    for r in range(len(y_lines) - 1):
-        for c in range(len(x_lines) - 1):
-            cell_x1 = x1 + x_lines[c]
-            cell_y1 = y1 + y_lines[r]
-            cell_x2 = x1 + x_lines[c + 1]
-            cell_y2 = y1 + y_lines[r + 1]
-            cells.append((cell_x1, cell_y1, cell_x2, cell_y2))
-    return cells
+    def __init__(self, image_cv, debug=False, scale=1.0):
+        self.scale = scale
+        self.gray = cv2.cvtColor(image_cv, cv2.COLOR_BGR2GRAY)
+        _, self.binary = cv2.threshold(self.gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+
+        kernel_len = self.px(LINE_KERNEL_LEN)
+        horizontal_kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (kernel_len, 1))
+        vertical_kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (1, kernel_len))
+
+        horizontal = cv2.morphologyEx(self.binary, cv2.MORPH_OPEN, horizontal_kernel)
+        self.horizontal = filter_short_lines(horizontal, min_len=self.px(MIN_H_LINE_LEN), axis='horizontal')
+
+        vertical = cv2.morphologyEx(self.binary, cv2.MORPH_OPEN, vertical_kernel)
+        self.vertical = filter_short_lines(vertical, min_len=self.px(MIN_V_LINE_LEN), axis='vertical')
+
+        self._table_binary = None
+        self._line_thickness = None
+        self._ink_integral = None
+
+        if debug:
+            print(f"[DEBUG] Page lines: {np.count_nonzero(self.horizontal)} horizontal px, "
+                  f"{np.count_nonzero(self.vertical)} vertical px")
+
+    def px(self, length):
+        """Convert a full-resolution pixel length to this image's resolution."""
+        return max(1, int(round(length * self.scale)))
+
+    @property
+    def table_binary(self):
+        """Fixed-threshold binarization used to find table outlines (computed on first use)."""
+        if self._table_binary is None:
+            _, self._table_binary = cv2.threshold(self.gray, 180, 255, cv2.THRESH_BINARY_INV)
+        return self._table_binary
+
+    @property
+    def line_thickness(self):
+        """
+        Thinner of the horizontal/vertical line thickness estimates, in full-resolution
+        pixels; 3 if no lines were found.
+        """
+        if self._line_thickness is None:
+            h_thickness = estimate_line_thickness(self.horizontal, axis='horizontal')
+            v_thickness = estimate_line_thickness(self.vertical, axis='vertical')
+            if h_thickness is None or v_thickness is None:
+                self._line_thickness = 3  # fallback value
+            else:
+                self._line_thickness = max(1, int(round(min(h_thickness, v_thickness) / self.scale)))
+        return self._line_thickness
+
+    def cell_ink(self, cells, margin):
+        """
+        Number of ink pixels inside each cell, ignoring `margin` pixels along the cell border
+        so that the grid lines themselves are not counted. Uses an integral image of the
+        binarized page, so each cell costs four lookups.
+        """
+        if self._ink_integral is None:
+            self._ink_integral = cv2.integral(self.binary // 255, sdepth=cv2.CV_32S)
+        ii = self._ink_integral
+        h, w = self.binary.shape
+
+        boxes = np.asarray(cells, dtype=np.int32).reshape(-1, 4)
+        ix1 = np.clip(boxes[:, 0] + margin, 0, w)
+        iy1 = np.clip(boxes[:, 1] + margin, 0, h)
+        ix2 = np.clip(np.maximum(boxes[:, 2] - margin, ix1), 0, w)
+        iy2 = np.clip(np.maximum(boxes[:, 3] - margin, iy1), 0, h)
+        return ii[iy2, ix2] - ii[iy1, ix2] - ii[iy2, ix1] + ii[iy1, ix1]
+
+    def table_gray(self, table_box):
+        """Grayscale view of a table region (only meaningful at full resolution)."""
+        x1, y1, x2, y2 = table_box
+        return self.gray[y1:y2, x1:x2]
+
+    def table_lines(self, table_box):
+        """Horizontal and vertical line masks of a table region, as views into the page masks."""
+        x1, y1, x2, y2 = table_box
+        return self.horizontal[y1:y2, x1:x2], self.vertical[y1:y2, x1:x2]
 
 
 def extract_text(image_pil):
     gray = cv2.cvtColor(np.array(image_pil), cv2.COLOR_RGB2GRAY)
-    return pytesseract.image_to_string(gray, config='--psm 6')
+    with ocr_engine.engine() as ocr:
+        return ocr.image_to_string(gray, psm=6)
 
-def detect_table_areas(image_cv, debug=True):
-    gray = cv2.cvtColor(image_cv, cv2.COLOR_BGR2GRAY)
-    _, binary = cv2.threshold(gray, 180, 255, cv2.THRESH_BINARY_INV)
+def detect_table_areas(image_cv, debug=True, page_lines=None):
+    if page_lines is None:
+        page_lines = PageLines(image_cv)
 
-    contours, _ = cv2.findContours(binary, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    # A table needs ruling lines in both directions; most text-only pages stop here
+    if cv2.countNonZero(page_lines.horizontal) == 0 or cv2.countNonZero(page_lines.vertical) == 0:
+        if debug:
+            print("[DEBUG] No ruling lines on the page, skipping table detection")
+        return []
 
+    contours, _ = cv2.findContours(page_lines.table_binary, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+    min_w, min_h = page_lines.px(100), page_lines.px(50)
     table_areas = []
     for cnt in contours:
         x, y, w, h = cv2.boundingRect(cnt)
-        if w > 100 and h > 50:
+        if w > min_w and h > min_h:
             table_areas.append((x, y, x + w, y + h))
 
     if debug:
         print(f"[DEBUG] Detected {len(table_areas)} potential tables")
     return table_areas
 
-def filter_short_lines(lines_img, min_len=30, axis='horizontal'):
-    result = np.zeros_like(lines_img)
-    contours, _ = cv2.findContours(lines_img, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
 
-    for cnt in contours:
-        x, y, w, h = cv2.boundingRect(cnt)
-        if axis == 'horizontal' and w >= min_len:
-            cv2.drawContours(result, [cnt], -1, 255, -1)
-        elif axis == 'vertical' and h >= min_len:
-            cv2.drawContours(result, [cnt], -1, 255, -1)
+def get_line_positions(lines, axis, tol, min_len=1, trace=tracing.NULL_TRACER):
+    """
+    Positions of the ruling lines in a line mask.
 
-    return result
+    A row (horizontal) or column (vertical) counts as part of a line when it holds at least
+    `min_len` line pixels; neighbouring rows/columns within `tol` are merged into one line.
+    """
+    trace.image(f"{axis}_lines_filtered", lines)
 
+    # Projection profile: number of line pixels per row (horizontal) or column (vertical)
+    profile = np.count_nonzero(lines, axis=1 if axis == 'horizontal' else 0)
+    return cluster_line_positions(profile >= min_len, tol)
 
 
-def get_line_positions(binary_img, axis, scale, tol, debug=False, debug_prefix=""):
-    if axis == 'horizontal':
-        kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (binary_img.shape[1] // scale, 1))
-    else:
-        kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (1, binary_img.shape[0] // scale))
+def cluster_line_positions(profile, tol):
+    """
+    Turn a projection profile into line positions.
 
-    lines = cv2.erode(binary_img, kernel, iterations=1)
-    lines = cv2.dilate(lines, kernel, iterations=1)
+    Rows/columns with any line pixels are grouped into runs where consecutive positions are at
+    most `tol` apart, and each run is reduced to its (floored) mean position.
+    """
+    coords = np.flatnonzero(profile)
+    if coords.size == 0:
+        return []
 
-    # Save raw lines before filtering
-    if debug and debug_prefix:
-        filename = f"debug_overlay/{debug_prefix}_{axis}_lines_raw.png"
-        cv2.imwrite(filename, lines)
-        print(f"[DEBUG] Saved raw {axis} lines to {filename}")
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(coords) > tol) + 1))
+    sums = np.add.reduceat(coords, starts)
+    counts = np.diff(np.append(starts, coords.size))
+    return (sums // counts).tolist()
 
-    # Use a lower min_len for vertical lines
-    min_len = 15 if axis == 'vertical' else 30
-    lines = filter_short_lines(lines, min_len=70 if axis == 'vertical' else 30, axis=axis)
 
+class CellGrid:
+    """
+    Table grid stored as its line coordinates (page pixels): cell (r, c) spans
+    x_lines[c]..x_lines[c + 1] horizontally and y_lines[r]..y_lines[r + 1] vertically.
 
-    if debug and debug_prefix:
-        filename = f"debug_overlay/{debug_prefix}_{axis}_lines_filtered.png"
-        cv2.imwrite(filename, lines)
-        print(f"[DEBUG] Saved filtered {axis} lines to {filename}")
+    Rows and columns are known by construction, so nothing has to be regrouped, and a table
+    costs two small int32 arrays instead of one tuple per cell.
+    """
 
-    intersections = cv2.findNonZero(lines)
-    if intersections is None:
-        return []
+    def __init__(self, x_lines, y_lines):
+        self.x_lines = np.asarray(x_lines, dtype=np.int32)
+        self.y_lines = np.asarray(y_lines, dtype=np.int32)
+
+    @property
+    def n_rows(self):
+        return max(0, len(self.y_lines) - 1)
+
+    @property
+    def n_cols(self):
+        return max(0, len(self.x_lines) - 1)
+
+    def __len__(self):
+        return self.n_rows * self.n_cols
+
+    def __iter__(self):
+        # Cells as (x1, y1, x2, y2) tuples, row by row
+        for r in range(self.n_rows):
+            for c in range(self.n_cols):
+                yield self.cell(r, c)
+
+    def cell(self, r, c):
+        return (int(self.x_lines[c]), int(self.y_lines[r]), int(self.x_lines[c + 1]), int(self.y_lines[r + 1]))
+
+    @property
+    def boxes(self):
+        """(N, 4) int32 array of (x1, y1, x2, y2), row-major."""
+        x1, y1 = np.meshgrid(self.x_lines[:-1], self.y_lines[:-1])
+        x2, y2 = np.meshgrid(self.x_lines[1:], self.y_lines[1:])
+        return np.stack([x1, y1, x2, y2], axis=-1).reshape(-1, 4).astype(np.int32)
+
+    def rows(self):
+        """Cells grouped by row, in the list-of-rows form returned by group_cells."""
+        return [[self.cell(r, c) for c in range(self.n_cols)] for r in range(self.n_rows)]
+
+    def scaled(self, factor):
+        """The same grid with its coordinates multiplied by `factor` (rounded)."""
+        return CellGrid(np.rint(self.x_lines * factor), np.rint(self.y_lines * factor))
+
+    def locate(self, x, y):
+        """
+        Row and column indices of the cells containing the points (x, y), as two arrays;
+        -1 where a point falls outside the grid.
+        """
+        r = np.searchsorted(self.y_lines, y, side='right') - 1
+        c = np.searchsorted(self.x_lines, x, side='right') - 1
+        outside = (r < 0) | (r >= self.n_rows) | (c < 0) | (c >= self.n_cols)
+        r[outside] = -1
+        c[outside] = -1
+        return r, c
+
+
+def detect_cells(image_cv, table_box, debug=False, page_lines=None, trace=tracing.NULL_TRACER):
+    """
+    Find the grid of a table region.
+
+    Returns:
+        CellGrid in page coordinates. Iterating it yields the (x1, y1, x2, y2) cell boxes.
+    """
+    if page_lines is None:
+        page_lines = PageLines(image_cv)
+
+    x1, y1, x2, y2 = table_box
+    horizontal_lines, vertical_lines = page_lines.table_lines(table_box)
+
+    # Lines shorter than 1/20 of the table are text strokes rather than grid lines
+    scale = 20
+    x_lines = get_line_positions(vertical_lines, axis='vertical', tol=page_lines.px(5),
+                                 min_len=max(page_lines.px(MIN_V_LINE_LEN), (y2 - y1) // scale), trace=trace)
+    y_lines = get_line_positions(horizontal_lines, axis='horizontal', tol=page_lines.px(8),
+                                 min_len=max(page_lines.px(MIN_H_LINE_LEN), (x2 - x1) // scale), trace=trace)
+
+    if debug:
+        print(f"[DEBUG] Grid lines - X: {len(x_lines)}, Y: {len(y_lines)}")
 
-    coords = sorted(set(p[0][1] if axis == 'horizontal' else p[0][0] for p in intersections))
-    clustered = []
-    cluster = [coords[0]]
-    for v in coords[1:]:
-        if abs(v - cluster[-1]) <= tol:
-            cluster.append(v)
+    return CellGrid(np.add(x_lines, x1), np.add(y_lines, y1))
+
+
+class TableCandidate:
+    """
+    A table region (x1, y1, x2, y2) with its grid and the scores deciding whether it is a table.
+
+    Attributes:
+        intersections: Number of ruling-line crossings in the region.
+        regularity: Crossings found relative to the grid's len(x_lines) * len(y_lines); close
+            to 1 for a ruled table, low for a few stray lines (logos, underlines, signatures).
+        coverage: Ruling-line pixels relative to all ink pixels in the region; close to 0 for
+            a block of text.
+        score: regularity, scaled down when coverage is below MIN_LINE_COVERAGE; 0 without a
+            single grid cell.
+    """
+
+    def __init__(self, box, grid, intersections, regularity, coverage):
+        self.box = box
+        self.grid = grid
+        self.intersections = intersections
+        self.regularity = regularity
+        self.coverage = coverage
+        if len(grid) == 0:
+            self.score = 0.0
         else:
-            clustered.append(int(np.mean(cluster)))
-            cluster = [v]
-    clustered.append(int(np.mean(cluster)))
-    return clustered
+            self.score = regularity * min(1.0, coverage / MIN_LINE_COVERAGE)
 
+    def to_dict(self):
+        return {
+            "box": [int(v) for v in self.box],
+            "rows": self.grid.n_rows,
+            "cols": self.grid.n_cols,
+            "intersections": self.intersections,
+            "regularity": round(self.regularity, 3),
+            "coverage": round(self.coverage, 3),
+            "score": round(self.score, 3),
+        }
+
+
+def score_table_candidate(image_cv, table_box, page_lines, debug=False, trace=tracing.NULL_TRACER):
+    """
+    Score a table region from its line masks alone: the grid (see detect_cells), the number
+    of line crossings and the share of the region's ink that is ruling lines. Costs a few
+    array passes over the region, no OCR.
+
+    Returns:
+        TableCandidate
+    """
+    grid = detect_cells(image_cv, table_box, debug, page_lines=page_lines, trace=trace)
 
-def detect_cells(image_cv, table_box, debug=False):
     x1, y1, x2, y2 = table_box
-    roi = image_cv[y1:y2, x1:x2]
-    gray = cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY)
-    _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    horizontal, vertical = page_lines.table_lines(table_box)
+    n_labels, _ = cv2.connectedComponents(cv2.bitwise_and(horizontal, vertical))
+    intersections = n_labels - 1  # Label 0 is the background
 
-    scale = 20
-    h_kernel_len = max(10, roi.shape[1] // scale)
-    v_kernel_len = max(10, roi.shape[0] // scale)
+    expected = len(grid.x_lines) * len(grid.y_lines)
+    regularity = min(1.0, intersections / expected) if expected else 0.0
 
-    horizontal_kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (h_kernel_len, 1))
-    vertical_kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (1, v_kernel_len))
+    ink = cv2.countNonZero(page_lines.binary[y1:y2, x1:x2])
+    coverage = (cv2.countNonZero(horizontal) + cv2.countNonZero(vertical)) / ink if ink else 0.0
 
-    horizontal_lines = cv2.erode(binary, horizontal_kernel, iterations=1)
-    horizontal_lines = cv2.dilate(horizontal_lines, horizontal_kernel, iterations=1)
-    horizontal_lines = filter_short_lines(horizontal_lines, min_len=30, axis='horizontal')
+    return TableCandidate(table_box, grid, intersections, regularity, coverage)
 
-    vertical_lines = cv2.erode(binary, vertical_kernel, iterations=1)
-    vertical_lines = cv2.dilate(vertical_lines, vertical_kernel, iterations=1)
-    vertical_lines = filter_short_lines(vertical_lines, min_len=70, axis='vertical')
 
-    x_lines = get_line_positions(vertical_lines, axis='vertical', scale=20, tol=5)
-    y_lines = get_line_positions(horizontal_lines, axis='horizontal', scale=20, tol=8)
+def box_overlap(a, b):
+    """Intersection area of two (x1, y1, x2, y2) boxes relative to the smaller one."""
+    w = min(a[2], b[2]) - max(a[0], b[0])
+    h = min(a[3], b[3]) - max(a[1], b[1])
+    if w <= 0 or h <= 0:
+        return 0.0
+    smaller = min((a[2] - a[0]) * (a[3] - a[1]), (b[2] - b[0]) * (b[3] - b[1]))
+    return w * h / smaller if smaller > 0 else 0.0
 
-    if debug:
-        print(f"[DEBUG] Grid lines - X: {len(x_lines)}, Y: {len(y_lines)}")
 
-    cells = []
-    for r in range(len(y_lines) - 1):
-        for c in range(len(x_lines) - 1):
-            cell_x1 = x1 + x_lines[c]
-            cell_y1 = y1 + y_lines[r]
-            cell_x2 = x1 + x_lines[c + 1]
-            cell_y2 = y1 + y_lines[r + 1]
-            cells.append((cell_x1, cell_y1, cell_x2, cell_y2))
-    return cells
+def select_tables(image_cv, page_lines, use_hough=False, debug=False, trace=tracing.NULL_TRACER):
+    """
+    Find the tables on a page and drop the regions that are not tables.
+
+    Every region from detect_table_areas (or from detect_table_areas_hough with use_hough) is
+    scored with score_table_candidate. Candidates scoring TABLE_MIN_SCORE or more are kept and
+    those below TABLE_REJECT_SCORE are dropped. If any candidate falls in between, the page is
+    low-confidence: the Hough detector runs as well and an uncertain candidate is kept only if
+    it overlaps one of its tables by at least half.
 
+    Returns:
+        (tables, info): the kept TableCandidates in detection order, and a dict with the number
+        of "rejected" candidates and whether the Hough detector ran ("hough").
+    """
+    if use_hough:
+        boxes = detect_table_areas_hough(image_cv, debug, trace=trace, scale=page_lines.scale)
+    else:
+        boxes = detect_table_areas(image_cv, debug, page_lines=page_lines)
+    candidates = [score_table_candidate(image_cv, box, page_lines, debug, trace=trace) for box in boxes]
+
+    keep = [c.score >= TABLE_MIN_SCORE for c in candidates]
+    uncertain = [i for i, c in enumerate(candidates) if TABLE_REJECT_SCORE <= c.score < TABLE_MIN_SCORE]
+    hough_ran = use_hough
+    if uncertain and not use_hough:
+        hough_boxes = detect_table_areas_hough(image_cv, debug, trace=trace, scale=page_lines.scale)
+        hough_ran = True
+        for i in uncertain:
+            keep[i] = any(box_overlap(candidates[i].box, hough_box) >= 0.5 for hough_box in hough_boxes)
+
+    tables = [c for c, kept in zip(candidates, keep) if kept]
+    if debug:
+        for c, kept in zip(candidates, keep):
+            print(f"[DEBUG] Table candidate {c.to_dict()}: {'kept' if kept else 'dropped'}")
+    trace.annotate(candidates=[dict(c.to_dict(), kept=kept) for c, kept in zip(candidates, keep)],
+                   hough=hough_ran)
+    return tables, {"rejected": len(candidates) - len(tables), "hough": hough_ran}
 
 
 def group_cells(cells, row_tol=10):
+    # A CellGrid already knows its rows
+    if isinstance(cells, CellGrid):
+        return cells.rows()
+
     rows = []
     for cell in sorted(cells, key=lambda b: b[1]):
         y1 = cell[1]
@@ -231,77 +440,244 @@ def group_cells(cells, row_tol=10):
         row.sort(key=lambda b: b[0])
     return rows
 
-def extract_text_from_cell(image_cv, cell, debug=False):
-    x1, y1, x2, y2 = cell
-    roi = image_cv[y1:y2, x1:x2]
+# Pixels whitened on each side of a grid line before OCR, so ruling lines are not read as
+# characters ("|", "_") or glued onto words.
+GRID_LINE_MARGIN = 4
+# White border added around an image before it is sent to OCR
+OCR_PADDING = 5
+# Smallest CLAHE tile, in pixels, when a whole table is contrast-enhanced at once
+MIN_CLAHE_TILE = 16
+# Cells with fewer ink pixels than this (full resolution, grid lines excluded) are treated as
+# empty and never sent to OCR
+BLANK_CELL_MIN_INK = 20
 
-    if roi.size == 0:
-        return ""
+_clahe_cache = threading.local()
 
-    # Preprocessing
-    gray = cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY)
-    padded = cv2.copyMakeBorder(gray, 5, 5, 5, 5, cv2.BORDER_CONSTANT, value=255)
 
-    # Increase contrast (optional but useful)
-    clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(4,4))
-    contrast = clahe.apply(padded)
+def get_clahe(tiles=(4, 4)):
+    """CLAHE object for the given tile grid, created once per thread and reused."""
+    cache = getattr(_clahe_cache, "objects", None)
+    if cache is None:
+        cache = _clahe_cache.objects = {}
+    clahe = cache.get(tiles)
+    if clahe is None:
+        clahe = cache[tiles] = cv2.createCLAHE(clipLimit=2.0, tileGridSize=tiles)
+    return clahe
 
-    # Save for debug
-    if debug:
-        debug_path = f"debug_overlay/cell_{x1}_{y1}_{x2}_{y2}_contrast.png"
-        cv2.imwrite(debug_path, contrast)
-        print(f"[DEBUG] Saved contrast-enhanced cell image to {debug_path}")
 
-    config = config = r'--oem 3 --psm 6'
+class TableImage:
+    """
+    OCR-ready version of one table: grayscale (a view of PageLines.gray), contrast-enhanced
+    once with CLAHE, with the grid lines whitened. Cells are cut out of it as views, so the
+    only per-cell work left before recognition is the padding.
+    """
+
+    def __init__(self, gray, table_box, grid, line_thickness=GRID_LINE_MARGIN):
+        # gray: grayscale of the table region (e.g. a PageLines.gray view) at full resolution
+        self.x1, self.y1 = table_box[:2]
+
+        # About 4x4 CLAHE tiles per cell, like the old per-cell enhancement
+        n_rows = max(1, grid.n_rows)
+        n_cols = max(1, grid.n_cols)
+        tiles = (
+            max(1, min(4 * n_cols, gray.shape[1] // MIN_CLAHE_TILE)),
+            max(1, min(4 * n_rows, gray.shape[0] // MIN_CLAHE_TILE)),
+        )
+        self.contrast = get_clahe(tiles).apply(gray) if gray.size else gray.copy()
+
+        # Whiten a band around every cell edge so ruling lines don't reach the OCR engine
+        m = max(GRID_LINE_MARGIN, line_thickness)
+        for x in grid.x_lines.tolist():
+            self.contrast[:, max(0, x - self.x1 - m):max(0, x - self.x1 + m + 1)] = 255
+        for y in grid.y_lines.tolist():
+            self.contrast[max(0, y - self.y1 - m):max(0, y - self.y1 + m + 1), :] = 255
+
+    def cell_view(self, cell):
+        x1, y1, x2, y2 = cell
+        return self.contrast[y1 - self.y1:y2 - self.y1, x1 - self.x1:x2 - self.x1]
+
+    def whiten_cells(self, grid, mask):
+        """
+        Whiten the cells of `grid` where the (n_rows, n_cols) boolean `mask` is set, so that a
+        whole-table OCR pass has nothing to read there.
+        """
+        for r, c in zip(*np.nonzero(mask)):
+            self.cell_view(grid.cell(r, c))[:] = 255
+
+    def padded(self, cell=None):
+        """Padded copy of one cell (or of the whole table), ready to hand to the OCR engine."""
+        image = self.contrast if cell is None else self.cell_view(cell)
+        p = OCR_PADDING
+        return cv2.copyMakeBorder(image, p, p, p, p, cv2.BORDER_CONSTANT, value=255)
+
+
+def extract_text_from_cell(image_cv, cell, debug=False, table_image=None, trace=tracing.NULL_TRACER):
+    x1, y1, x2, y2 = cell
+
+    if table_image is not None:
+        # Gray + contrast were computed once for the whole table
+        if table_image.cell_view(cell).size == 0:
+            return ""
+        contrast = table_image.padded(cell)
+    else:
+        roi = image_cv[y1:y2, x1:x2]
+        if roi.size == 0:
+            return ""
+
+        # Preprocessing
+        gray = cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY)
+        p = OCR_PADDING
+        padded = cv2.copyMakeBorder(gray, p, p, p, p, cv2.BORDER_CONSTANT, value=255)
+
+        # Increase contrast (optional but useful)
+        contrast = get_clahe().apply(padded)
 
-    text = pytesseract.image_to_string(contrast, config=config)
+    trace.image("cell_contrast", contrast)
+
+    with ocr_engine.engine() as ocr:
+        text = ocr.image_to_string(contrast, psm=6)
 
     if debug:
         print(f"[DEBUG] OCR cell ({x1}, {y1}, {x2}, {y2}): '{text.strip()}'")
 
     return text.strip()
 
-import cv2
-import numpy as np
 
-def detect_table_areas_hough(image_cv, debug=False):
+def ocr_words(image_gray, psm=11):
+    """
+    Run one OCR pass and return the recognized words with their boxes.
+
+    Returns a list of dicts with keys: text, left, top, right, bottom, conf and
+    line (a (block, paragraph, line) tuple identifying the text line the word belongs to).
+    """
+    with ocr_engine.engine() as ocr:
+        return ocr.image_to_words(image_gray, psm=psm)
+
+
+def words_in_grid(words, grid):
+    """The words whose center lies in one of the grid's cells."""
+    if not words:
+        return []
+    cx = np.array([(w["left"] + w["right"]) / 2 for w in words])
+    cy = np.array([(w["top"] + w["bottom"]) / 2 for w in words])
+    rows, _ = grid.locate(cx, cy)
+    return [word for word, r in zip(words, rows.tolist()) if r >= 0]
+
+
+def assign_words_to_cells(words, grid):
+    """
+    Map word boxes onto grid cells and build the cell texts.
+
+    Args:
+        words (list): Words as returned by ocr_words, in the same coordinates as the grid.
+        grid (CellGrid): Table grid from detect_cells.
+
+    Returns:
+        List of rows of cell texts (n_rows x n_cols). A word belongs to the cell that contains
+        its center; words of the same text line are joined by spaces, lines by newlines.
+    """
+    cell_words = [[[] for _ in range(grid.n_cols)] for _ in range(grid.n_rows)]
+
+    if words:
+        cx = np.array([(w["left"] + w["right"]) / 2 for w in words])
+        cy = np.array([(w["top"] + w["bottom"]) / 2 for w in words])
+        rows, cols = grid.locate(cx, cy)
+        for word, r, c in zip(words, rows.tolist(), cols.tolist()):
+            if r >= 0:
+                cell_words[r][c].append(word)
+
+    data = []
+    for row in cell_words:
+        row_text = []
+        for words_in_cell in row:
+            # Lines top to bottom, words of a line left to right; sorting all words by their top
+            # edge alone would swap words whose boxes start a pixel apart on the same line
+            lines = {}
+            for word in words_in_cell:
+                lines.setdefault(word["line"], []).append(word)
+            ordered = sorted(lines.values(), key=lambda line: min(w["top"] for w in line))
+            row_text.append("\n".join(
+                " ".join(w["text"] for w in sorted(line, key=lambda w: w["left"])) for line in ordered))
+        data.append(row_text)
+    return data
+
+
+def extract_table_text(image_cv, table_box, grid, debug=False, table_image=None, trace=tracing.NULL_TRACER):
+    """
+    OCR a whole table in a single Tesseract call and split the result into cells.
+
+    The table is prepared once (see TableImage): gray, contrast-enhanced and with the grid
+    lines whitened so that cells are separated by blank gutters. The word boxes returned by
+    Tesseract are then mapped back onto the cells of `grid`.
+
+    Returns:
+        List of rows of cell texts (n_rows x n_cols).
+    """
+    if len(grid) == 0:
+        return []
+
+    x1, y1, x2, y2 = table_box
+    if table_image is None:
+        gray = cv2.cvtColor(image_cv[y1:y2, x1:x2], cv2.COLOR_BGR2GRAY)
+        table_image = TableImage(gray, table_box, grid)
+    if table_image.contrast.size == 0:
+        return [["" for _ in range(grid.n_cols)] for _ in range(grid.n_rows)]
+
+    padded = table_image.padded()
+
+    trace.image("table_contrast", padded)
+
+    words = ocr_words(padded)
+    trace.annotate(words=len(words))
+
+    # Shift word boxes from padded-ROI coordinates back to page coordinates
+    for word in words:
+        for key, offset in (("left", x1), ("right", x1), ("top", y1), ("bottom", y1)):
+            word[key] += offset - OCR_PADDING
+
+    if debug:
+        print(f"[DEBUG] OCR table ({x1}, {y1}, {x2}, {y2}): {len(words)} words")
+
+    return assign_words_to_cells(words, grid)
+
+def detect_table_areas_hough(image_cv, debug=False, trace=tracing.NULL_TRACER, scale=1.0):
     """
     Detect table areas in the image using Hough line detection.
 
     Args:
         image_cv (np.ndarray): Input BGR image.
-        debug (bool): If True, show intermediate images.
+        debug (bool): If True, print the detected boxes.
+        trace (tracing.Tracer): Receives the intermediate images.
+        scale (float): Resolution of image_cv relative to the full page (see PageLines).
 
     Returns:
-        List of bounding boxes of detected tables in format (x, y, w, h).
+        List of bounding boxes of detected tables in format (x1, y1, x2, y2), like
+        detect_table_areas.
     """
+    def px(length):
+        return max(1, int(round(length * scale)))
+
     gray = cv2.cvtColor(image_cv, cv2.COLOR_BGR2GRAY)
     # Binarize the image - you may tune thresholding method here
     _, binary = cv2.threshold(gray, 128, 255, cv2.THRESH_BINARY_INV | cv2.THRESH_OTSU)
 
-    if debug:
-        cv2.imshow("Binary", binary)
-        cv2.waitKey(0)
+    trace.image("hough_binary", binary)
 
     # Detect horizontal lines
-    horizontal_kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (40, 1))
+    horizontal_kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (px(LINE_KERNEL_LEN), 1))
     horizontal_lines = cv2.morphologyEx(binary, cv2.MORPH_OPEN, horizontal_kernel, iterations=2)
 
     # Detect vertical lines
-    vertical_kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (1, 40))
+    vertical_kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (1, px(LINE_KERNEL_LEN)))
     vertical_lines = cv2.morphologyEx(binary, cv2.MORPH_OPEN, vertical_kernel, iterations=2)
 
-    if debug:
-        cv2.imshow("Horizontal lines", horizontal_lines)
-        cv2.imshow("Vertical lines", vertical_lines)
-        cv2.waitKey(0)
+    trace.image("hough_horizontal_lines", horizontal_lines)
+    trace.image("hough_vertical_lines", vertical_lines)
 
-    # Combine lines to get table mask
-    table_mask = cv2.bitwise_and(horizontal_lines, vertical_lines)
+    # Combine lines to get table mask (their intersection alone would only be the crossing points)
+    table_mask = cv2.bitwise_or(horizontal_lines, vertical_lines)
 
-    if debug:
-        cv2.imshow("Table mask", table_mask)
-        cv2.waitKey(0)
+    trace.image("hough_table_mask", table_mask)
 
     # Find contours from the table mask
     contours, _ = cv2.findContours(table_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
@@ -310,56 +686,166 @@ def detect_table_areas_hough(image_cv, debug=False):
     for cnt in contours:
         x, y, w, h = cv2.boundingRect(cnt)
         # Filter out small boxes that are unlikely tables
-        if w > 50 and h > 50:
-            boxes.append((x, y, w, h))
+        if w > px(50) and h > px(50):
+            boxes.append((x, y, x + w, y + h))
             if debug:
                 print(f"Detected table box: x={x}, y={y}, w={w}, h={h}")
 
-    if debug:
+    if trace:
         # Draw detected boxes on a copy of the image for visualization
         img_copy = image_cv.copy()
-        for (x, y, w, h) in boxes:
-            cv2.rectangle(img_copy, (x, y), (x + w, y + h), (0, 255, 0), 2)
-        cv2.imshow("Detected tables", img_copy)
-        cv2.waitKey(0)
-        cv2.destroyAllWindows()
+        for (x1, y1, x2, y2) in boxes:
+            cv2.rectangle(img_copy, (x1, y1), (x2, y2), (0, 255, 0), 2)
+        trace.image("hough_detected_tables", img_copy)
 
     return boxes
 
 
+def scale_box(box, factor):
+    """Scale (x1, y1, x2, y2) coordinates by `factor`, e.g. from a detection image to the full page."""
+    return tuple(int(round(v * factor)) for v in box)
 
 
+def extract_structured_data(image, debug=False, use_hough=False, debug_id=None, batch_ocr=True,
+                            detect_scale=1.0, words=None, blank_min_ink=BLANK_CELL_MIN_INK,
+                            trace=tracing.NULL_TRACER):
+    """
+    Detect tables on a page and OCR their cells.
 
+    `image` may be a PIL image or a BGR NumPy array (see to_bgr_array); passing the array
+    straight from the rasterizer avoids any intermediate PNG round-trip.
 
+    With batch_ocr (the default) each table is recognized in one Tesseract call and the words
+    are mapped back onto the grid; otherwise every cell gets its own Tesseract call.
 
+    With detect_scale < 1, table and grid detection run on a downsampled copy of the page
+    (e.g. 0.5 = 150 DPI for a 300 DPI render) and only the detected table regions are read
+    from the full-resolution image for OCR.
 
-def extract_structured_data(image_pil, debug=False, use_hough=False, debug_id=None):
-    import cv2
-    import numpy as np
+    `words` is the page's embedded text layer (see pdf_to_png.extract_text_words), in page
+    pixel coordinates. When given, tables holding any of these words get them assigned to
+    their cells directly, without OCR; tables the text layer has no words in (e.g. a scan
+    with only a digital stamp or page number on top) are still OCR'd.
 
-    image_cv = cv2.cvtColor(np.array(image_pil), cv2.COLOR_RGB2BGR)
+    Table regions are scored first (see select_tables) and regions that do not look like a
+    ruled table are dropped; `use_hough` makes the Hough detector find the regions instead
+    of only double-checking uncertain ones.
 
-    if use_hough:
-        # Use Hough transform based table detection as fallback
-        table_areas = detect_table_areas_hough(image_cv, debug)
+    Cells with fewer than `blank_min_ink` ink pixels are returned as "" without OCR; the
+    result's "stats" counts them, along with the cells, the Tesseract calls made and the
+    dropped table regions.
+
+    `trace` (a tracing.Tracer) records a span per stage, table and OCR'd cell, and receives
+    the intermediate images.
+    """
+    timings = {"detect_tables": 0.0, "detect_cells": 0.0, "ocr": 0.0}
+    t0 = time.perf_counter()
+    image_cv = to_bgr_array(image)
+
+    if detect_scale < 1.0:
+        detect_cv = cv2.resize(image_cv, None, fx=detect_scale, fy=detect_scale, interpolation=cv2.INTER_AREA)
     else:
-        # Use your default table detection method
-        table_areas = detect_table_areas(image_cv, debug)
+        detect_scale = 1.0
+        detect_cv = image_cv
+
+    with trace.span("detect_tables", detect_scale=detect_scale):
+        # Binarization and line masks are computed once and shared by every stage below
+        page_lines = PageLines(detect_cv, debug=debug, scale=detect_scale)
+
+        # Regions are scored and non-tables dropped before any OCR; with use_hough the Hough
+        # detector finds the regions, otherwise it only runs on low-confidence pages
+        candidates, selection = select_tables(detect_cv, page_lines, use_hough=use_hough, debug=debug, trace=trace)
+    timings["detect_tables"] = time.perf_counter() - t0
 
     tables = []
     cell_boxes = []
-
-    for box in table_areas:
-        cells = detect_cells(image_cv, box, debug)
-        rows = group_cells(cells)
-        data = []
-        for row in rows:
-            row_text = []
-            for cell in row:
-                text = extract_text_from_cell(image_cv, cell, debug=debug)
-                row_text.append(text)
-                cell_boxes.append(cell)  # Collect bounding box here
-            data.append(row_text)
-        tables.append({"data": data, "box": box})
-
-    return {"tables": tables, "cell_boxes": cell_boxes}
+    stats = {"cells": 0, "blank_cells_skipped": 0, "ocr_calls": 0, "text_layer_tables": 0,
+             "tables_rejected": selection["rejected"], "hough_fallback": int(selection["hough"] and not use_hough)}
+
+    # Blank-cell test runs on the detection image; ink and border are scaled to it
+    ink_margin = page_lines.px(max(GRID_LINE_MARGIN, page_lines.line_thickness))
+    min_ink = blank_min_ink * detect_scale * detect_scale
+
+    for table_index, candidate in enumerate(candidates):
+        with trace.span("table", index=table_index, score=round(candidate.score, 3)):
+            t0 = time.perf_counter()
+            # The grid was already found while scoring the region
+            detect_box, detect_grid = candidate.box, candidate.grid
+            blank = (page_lines.cell_ink(detect_grid.boxes, ink_margin) < min_ink).reshape(
+                detect_grid.n_rows, detect_grid.n_cols)
+
+            # Map detection coordinates back to the full-resolution page
+            box = scale_box(detect_box, 1 / detect_scale)
+            if detect_scale != 1.0:
+                grid = detect_grid.scaled(1 / detect_scale)
+                x1, y1, x2, y2 = box
+                table_gray = cv2.cvtColor(image_cv[y1:y2, x1:x2], cv2.COLOR_BGR2GRAY)
+            else:
+                grid = detect_grid
+                table_gray = page_lines.table_gray(box)
+            stats["cells"] += len(grid)
+            cell_boxes.append(grid.boxes)
+            table = {"data": None, "box": box, "x_lines": grid.x_lines.tolist(), "y_lines": grid.y_lines.tolist()}
+            tables.append(table)
+            t1 = time.perf_counter()
+            timings["detect_cells"] += t1 - t0
+            trace.annotate(box=list(box), rows=grid.n_rows, cols=grid.n_cols)
+
+            table_words = words_in_grid(words, grid) if words is not None else []
+            if table_words:
+                # Born-digital table: the text is already known, only the grid was needed
+                with trace.span("assign_words"):
+                    table["data"] = assign_words_to_cells(table_words, grid)
+                stats["text_layer_tables"] += 1
+                timings["ocr"] += time.perf_counter() - t1
+                continue
+
+            n_blank = int(np.count_nonzero(blank))
+            stats["blank_cells_skipped"] += n_blank
+            trace.annotate(blank_cells=n_blank)
+            if debug:
+                print(f"[DEBUG] {n_blank} of {len(grid)} cells are blank")
+
+            if n_blank == len(grid):
+                # Nothing to read in this table
+                table["data"] = [["" for _ in range(grid.n_cols)] for _ in range(grid.n_rows)]
+            elif batch_ocr:
+                table_image = TableImage(table_gray, box, grid, line_thickness=page_lines.line_thickness)
+                # Blank cells are whitened, so the single table OCR call never sees their pixels
+                table_image.whiten_cells(grid, blank)
+                with trace.span("ocr_table"):
+                    data = extract_table_text(image_cv, box, grid, debug=debug, table_image=table_image,
+                                              trace=trace)
+                stats["ocr_calls"] += 1
+                # A word spilling over from a neighbouring cell is not a blank cell's text
+                table["data"] = [
+                    ["" if is_blank else text for is_blank, text in zip(blank_row, row_text)]
+                    for blank_row, row_text in zip(blank.tolist(), data)
+                ]
+            else:
+                table_image = TableImage(table_gray, box, grid, line_thickness=page_lines.line_thickness)
+                data = []
+                for r in range(grid.n_rows):
+                    row_text = []
+                    for c in range(grid.n_cols):
+                        if blank[r, c]:
+                            text = ""  # Skip OCR for empty cells
+                        else:
+                            with trace.span("ocr_cell", row=r, col=c):
+                                text = extract_text_from_cell(image_cv, grid.cell(r, c), debug=debug,
+                                                              table_image=table_image, trace=trace)
+                        row_text.append(text)
+                    data.append(row_text)
+                table["data"] = data
+                stats["ocr_calls"] += len(grid) - n_blank
+            timings["ocr"] += time.perf_counter() - t1
+
+    return {
+        "tables": tables,
+        # (N, 4) int32 array with the boxes of every cell on the page
+        "cell_boxes": np.concatenate(cell_boxes) if cell_boxes else np.empty((0, 4), np.int32),
+        # Pages with any OCR'd table count as OCR'd
+        "text_source": "text_layer" if words is not None and stats["ocr_calls"] == 0 else "ocr",
+        "stats": stats,
+        "timings": timings,
+    }
@@ -0,0 +1,134 @@
+import itertools
+import math
+import os
+import threading
+import time
+
+import workers
+
+# Pages being rendered/OCR'd at once across all jobs
+MAX_PAGES_IN_FLIGHT = int(os.environ.get("PDEFFER_MAX_PAGES_IN_FLIGHT", workers.OCR_WORKERS * 2))
+# Pages admitted but not done yet; uploads that would go beyond this are turned away (429)
+MAX_BACKLOG_PAGES = int(os.environ.get("PDEFFER_MAX_BACKLOG_PAGES", 2000))
+# Bounds of the Retry-After estimate, in seconds
+MIN_RETRY_AFTER = 1
+MAX_RETRY_AFTER = 3600
+
+
+class Overloaded(Exception):
+    """Raised by PageScheduler.admit when the backlog is full; retry_after is in seconds."""
+
+    def __init__(self, retry_after, backlog_pages):
+        super().__init__(f"Backlog of {backlog_pages} pages is full, retry in {retry_after}s")
+        self.retry_after = retry_after
+        self.backlog_pages = backlog_pages
+
+
+class PageScheduler:
+    """
+    Admission control and fair page-level scheduling for all jobs of the process.
+
+    Jobs are admitted with their page count while the total backlog stays within
+    `max_backlog` pages. Each page then needs a slot (acquire/release) before it goes to the
+    worker pool; at most `max_in_flight` slots are held at once. A free slot goes to the
+    waiting client with the fewest pages in flight (oldest request first on ties), so every
+    client gets an equal share of the workers and a 2-page job never waits for a 500-page
+    job's backlog.
+    """
+
+    def __init__(self, max_in_flight=MAX_PAGES_IN_FLIGHT, max_backlog=MAX_BACKLOG_PAGES):
+        self.max_in_flight = max(1, max_in_flight)
+        self.max_backlog = max_backlog
+        self.rejected = 0
+        self._cond = threading.Condition()
+        self._in_flight = {}  # client -> pages in flight
+        self._in_flight_total = 0
+        self._waiting = {}  # ticket -> client
+        self._tickets = itertools.count()
+        self._backlog = {}  # job_id -> pages not done yet
+        self._page_seconds = None  # Moving average of how long a slot is held
+
+    def backlog_pages(self):
+        with self._cond:
+            return sum(self._backlog.values())
+
+    def in_flight(self):
+        with self._cond:
+            return self._in_flight_total
+
+    def retry_after(self, excess_pages):
+        """Seconds until `excess_pages` pages should have been worked off at the current rate."""
+        with self._cond:
+            page_seconds = self._page_seconds or 1.0
+        pages_per_second = self.max_in_flight / page_seconds
+        return int(min(MAX_RETRY_AFTER, max(MIN_RETRY_AFTER, math.ceil(excess_pages / pages_per_second))))
+
+    def admit(self, job_id, pages):
+        """
+        Add a job's pages to the backlog, or raise Overloaded if they don't fit. With
+        job_id=None nothing is added, it only checks (e.g. before accepting an upload).
+        """
+        with self._cond:
+            backlog = sum(self._backlog.values())
+            # An idle service takes any job, however long
+            if not backlog or backlog + pages <= self.max_backlog:
+                if job_id is not None:
+                    self._backlog[job_id] = pages
+                return
+            self.rejected += 1
+        raise Overloaded(self.retry_after(backlog + pages - self.max_backlog), backlog)
+
+    def finish(self, job_id):
+        """Drop whatever is left of a job's backlog (it finished, failed or was cancelled)."""
+        with self._cond:
+            self._backlog.pop(job_id, None)
+
+    def _next_ticket(self):
+        # Caller holds the lock; the least-served client goes first, then the oldest request
+        return min(self._waiting, key=lambda t: (self._in_flight.get(self._waiting[t], 0), t))
+
+    def acquire(self, client):
+        """Block until `client` may start one page; returns a token for release()."""
+        with self._cond:
+            ticket = next(self._tickets)
+            self._waiting[ticket] = client
+            try:
+                self._cond.wait_for(
+                    lambda: self._in_flight_total < self.max_in_flight and self._next_ticket() == ticket)
+            finally:
+                del self._waiting[ticket]
+            self._in_flight[client] = self._in_flight.get(client, 0) + 1
+            self._in_flight_total += 1
+            # The next waiter may be eligible for a remaining slot
+            self._cond.notify_all()
+        return client, time.perf_counter()
+
+    def release(self, token, job_id=None):
+        """Give a slot back; with job_id the page also leaves that job's backlog."""
+        client, started = token
+        seconds = time.perf_counter() - started
+        with self._cond:
+            self._in_flight[client] -= 1
+            if not self._in_flight[client]:
+                del self._in_flight[client]
+            self._in_flight_total -= 1
+            if job_id in self._backlog:
+                self._backlog[job_id] = max(0, self._backlog[job_id] - 1)
+            self._page_seconds = seconds if self._page_seconds is None else 0.9 * self._page_seconds + 0.1 * seconds
+            self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            return {
+                "pages_in_flight": self._in_flight_total,
+                "max_pages_in_flight": self.max_in_flight,
+                "backlog_pages": sum(self._backlog.values()),
+                "max_backlog_pages": self.max_backlog,
+                "clients_in_flight": len(self._in_flight),
+                "waiting": len(self._waiting),
+                "avg_page_seconds": self._page_seconds,
+                "rejected": self.rejected,
+            }
+
+
+scheduler = PageScheduler()
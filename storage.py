@@ -0,0 +1,192 @@
+import json
+import os
+import shutil
+import threading
+
+import cache
+
+try:
+    import boto3
+    from botocore.exceptions import ClientError
+except ImportError:  # Optional dependency, only needed for the S3 backend
+    boto3 = None
+
+STORAGE_BACKEND = os.environ.get("PDEFFER_STORAGE", "local")  # "local" or "s3"
+# Local backend: shared directory (e.g. a volume every worker mounts). Defaults to the job
+# folders themselves, so a single host does not copy anything.
+STORAGE_DIR = os.environ.get("PDEFFER_STORAGE_DIR", "tmp_local/pdeffer")
+# S3 backend; S3_ENDPOINT_URL points at any S3-compatible server, e.g. http://localhost:9000 for MinIO
+S3_BUCKET = os.environ.get("PDEFFER_S3_BUCKET", "pdeffer")
+S3_PREFIX = os.environ.get("PDEFFER_S3_PREFIX", "")
+S3_ENDPOINT_URL = os.environ.get("PDEFFER_S3_ENDPOINT_URL") or None
+S3_REGION = os.environ.get("PDEFFER_S3_REGION") or None
+
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024  # 1 MiB
+
+
+class LocalStorage:
+    """
+    Objects stored as files under `root`; keys are relative paths such as "<job_id>/output.docx".
+    """
+    name = "local"
+
+    def __init__(self, root=STORAGE_DIR):
+        self.root = root
+
+    def _path(self, key):
+        return os.path.join(self.root, *key.split("/"))
+
+    def local_path(self, key):
+        """Filesystem path of an object, or None if it does not exist."""
+        path = self._path(key)
+        return path if os.path.isfile(path) else None
+
+    def _write_atomic(self, key, write):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        write(tmp_path)
+        os.replace(tmp_path, path)
+
+    def put_file(self, key, src_path):
+        if os.path.abspath(src_path) == os.path.abspath(self._path(key)):
+            return  # Already in place, e.g. a job's output written straight into its folder
+        self._write_atomic(key, lambda tmp: shutil.copyfile(src_path, tmp))
+
+    def put_bytes(self, key, data):
+        def _write(tmp_path):
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+        self._write_atomic(key, _write)
+
+    def get_bytes(self, key):
+        try:
+            with open(self._path(key), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def size(self, key):
+        """Size of an object in bytes, or None if it does not exist."""
+        try:
+            return os.path.getsize(self._path(key))
+        except FileNotFoundError:
+            return None
+
+    def iter_chunks(self, key, chunk_size=DOWNLOAD_CHUNK_SIZE):
+        with open(self._path(key), "rb") as f:
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+
+    def list(self, prefix):
+        """Keys starting with `prefix` (a "<dir>/" prefix), sorted."""
+        directory = self._path(prefix.rstrip("/"))
+        keys = []
+        for root, _, files in os.walk(directory):
+            for name in files:
+                if not name.endswith(".tmp"):
+                    rel = os.path.relpath(os.path.join(root, name), self.root)
+                    keys.append(rel.replace(os.sep, "/"))
+        return sorted(keys)
+
+    def delete_prefix(self, prefix):
+        shutil.rmtree(self._path(prefix.rstrip("/")), ignore_errors=True)
+
+
+class S3Storage:
+    """
+    Objects in an S3 bucket (or any S3-compatible server such as MinIO), under `prefix`.
+    Credentials come from the usual boto3 sources (environment, config files, instance role).
+    """
+    name = "s3"
+
+    def __init__(self, bucket=S3_BUCKET, prefix=S3_PREFIX, endpoint_url=S3_ENDPOINT_URL, region=S3_REGION):
+        if boto3 is None:
+            raise RuntimeError("PDEFFER_STORAGE=s3 but boto3 is not installed")
+        self.bucket = bucket
+        self.prefix = prefix.strip("/") + "/" if prefix.strip("/") else ""
+        self.client = boto3.client("s3", endpoint_url=endpoint_url, region_name=region)
+
+    def _key(self, key):
+        return self.prefix + key
+
+    def local_path(self, key):
+        return None
+
+    def put_file(self, key, src_path):
+        self.client.upload_file(src_path, self.bucket, self._key(key))
+
+    def put_bytes(self, key, data):
+        self.client.put_object(Bucket=self.bucket, Key=self._key(key), Body=data)
+
+    def get_bytes(self, key):
+        try:
+            return self.client.get_object(Bucket=self.bucket, Key=self._key(key))["Body"].read()
+        except ClientError as e:
+            if e.response["Error"]["Code"] in ("NoSuchKey", "404"):
+                return None
+            raise
+
+    def size(self, key):
+        try:
+            return self.client.head_object(Bucket=self.bucket, Key=self._key(key))["ContentLength"]
+        except ClientError as e:
+            if e.response["Error"]["Code"] in ("NoSuchKey", "404"):
+                return None
+            raise
+
+    def iter_chunks(self, key, chunk_size=DOWNLOAD_CHUNK_SIZE):
+        body = self.client.get_object(Bucket=self.bucket, Key=self._key(key))["Body"]
+        try:
+            yield from body.iter_chunks(chunk_size)
+        finally:
+            body.close()
+
+    def list(self, prefix):
+        keys = []
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self._key(prefix)):
+            keys.extend(obj["Key"][len(self.prefix):] for obj in page.get("Contents", []))
+        return sorted(keys)
+
+    def delete_prefix(self, prefix):
+        keys = self.list(prefix)
+        for i in range(0, len(keys), 1000):  # delete_objects takes at most 1000 keys
+            self.client.delete_objects(Bucket=self.bucket, Delete={
+                "Objects": [{"Key": self._key(key)} for key in keys[i:i + 1000]],
+                "Quiet": True,
+            })
+
+
+def put_json(store, key, obj):
+    store.put_bytes(key, json.dumps(obj, default=cache.json_default).encode("utf-8"))
+
+
+def get_json(store, key):
+    data = store.get_bytes(key)
+    return json.loads(data) if data is not None else None
+
+
+def create_storage(backend=STORAGE_BACKEND):
+    if backend == "local":
+        return LocalStorage()
+    if backend == "s3":
+        return S3Storage()
+    raise ValueError(f"Unknown storage backend {backend!r}, expected 'local' or 's3'")
+
+
+_storage = None
+_storage_lock = threading.Lock()
+
+
+def get_storage():
+    """Return the process-wide storage backend, creating it on first use."""
+    global _storage
+    if _storage is None:
+        with _storage_lock:
+            if _storage is None:
+                _storage = create_storage()
+    return _storage
@@ -0,0 +1,62 @@
+"""
+Scaling benchmark for docx_writer.
+
+Writes single-table documents of growing row counts with the bulk XML writer and, for the
+smaller sizes, with the old cell(r, c).text loop, and prints the time per row so linear
+scaling (constant time per row) is easy to see.
+
+Usage: python test-tools/bench_docx_writer.py [cols]
+"""
+import os
+import sys
+import tempfile
+import time
+
+from docx import Document
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import docx_writer
+
+ROW_COUNTS = [100, 1000, 2500, 5000, 10000]
+OLD_WRITER_MAX_ROWS = 2500  # The cell() loop gets too slow to wait for beyond this
+
+
+def make_data(rows, cols):
+    return [[f"r{r} c{c} 12,345.67" for c in range(cols)] for r in range(rows)]
+
+
+def write_old(data, path):
+    doc = Document()
+    doc_table = doc.add_table(rows=len(data), cols=len(data[0]))
+    doc_table.style = "Table Grid"
+    for r, row in enumerate(data):
+        for c, cell_text in enumerate(row):
+            doc_table.cell(r, c).text = cell_text or ""
+    doc.save(path)
+
+
+def write_new(data, path):
+    docx_writer.write_multi_page_ocr_output_to_docx([{"tables": [{"data": data}]}], path)
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    cols = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.docx")
+        print(f"{'rows':>6} | {'bulk writer':>12} {'us/row':>8} | {'cell() loop':>12} {'us/row':>8}")
+        for rows in ROW_COUNTS:
+            data = make_data(rows, cols)
+            t_new = timed(write_new, data, path)
+            line = f"{rows:>6} | {t_new:>10.2f} s {t_new / rows * 1e6:>8.0f} |"
+            if rows <= OLD_WRITER_MAX_ROWS:
+                t_old = timed(write_old, data, path)
+                line += f" {t_old:>10.2f} s {t_old / rows * 1e6:>8.0f}"
+            else:
+                line += f" {'skipped':>12}"
+            print(line)
@@ -0,0 +1,77 @@
+"""
+Before/after benchmark for png_ocr.get_line_positions.
+
+Builds a synthetic table line mask, times the old point-by-point clustering against the
+projection-profile version, and checks both return the same positions.
+
+Usage: python test-tools/bench_line_positions.py [rows] [cols]
+"""
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import png_ocr
+
+
+def old_positions(lines, axis, tol):
+    # Pre-vectorization implementation, kept here for comparison
+    intersections = cv2.findNonZero(lines)
+    if intersections is None:
+        return []
+    coords = sorted(set(p[0][1] if axis == 'horizontal' else p[0][0] for p in intersections))
+    clustered = []
+    cluster = [coords[0]]
+    for v in coords[1:]:
+        if abs(v - cluster[-1]) <= tol:
+            cluster.append(v)
+        else:
+            clustered.append(int(np.mean(cluster)))
+            cluster = [v]
+    clustered.append(int(np.mean(cluster)))
+    return clustered
+
+
+def new_positions(lines, axis, tol):
+    profile = np.count_nonzero(lines, axis=1 if axis == 'horizontal' else 0)
+    return png_ocr.cluster_line_positions(profile, tol)
+
+
+def make_mask(rows, cols, cell_w=120, cell_h=50, thickness=3):
+    h, w = rows * cell_h + 10, cols * cell_w + 10
+    horizontal = np.zeros((h, w), np.uint8)
+    vertical = np.zeros((h, w), np.uint8)
+    for r in range(rows + 1):
+        y = 5 + r * cell_h
+        horizontal[y:y + thickness, 5:w - 5] = 255
+    for c in range(cols + 1):
+        x = 5 + c * cell_w
+        vertical[5:h - 5, x:x + thickness] = 255
+    return horizontal, vertical
+
+
+def best_of(fn, *args, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+if __name__ == "__main__":
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 60
+    cols = int(sys.argv[2]) if len(sys.argv) > 2 else 12
+    horizontal, vertical = make_mask(rows, cols)
+    print(f"Mask: {horizontal.shape[1]}x{horizontal.shape[0]}, {rows}x{cols} cells")
+
+    for name, mask, axis, tol in (("horizontal", horizontal, "horizontal", 8),
+                                  ("vertical", vertical, "vertical", 5)):
+        t_old, old = best_of(old_positions, mask, axis, tol)
+        t_new, new = best_of(new_positions, mask, axis, tol)
+        assert old == new, f"{name}: positions differ\n{old}\n{new}"
+        print(f"{name:>10}: before {t_old * 1000:8.2f} ms | after {t_new * 1000:6.2f} ms | "
+              f"{t_old / t_new:6.1f}x | {len(new)} lines")
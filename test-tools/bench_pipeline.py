@@ -0,0 +1,283 @@
+"""
+Stage-level pipeline benchmark with stored baselines.
+
+Generates synthetic table PDFs (see synthetic_pdf.py), runs the pipeline on them in this
+process and times every stage separately: rasterize, table detection, cell detection, OCR
+and DOCX writing. Results are compared with a JSON baseline; a stage that got slower than
+the tolerance allows is reported as a regression and the script exits with status 1.
+The cell texts read are checked against the texts drawn into the PDF, so a drop in OCR
+accuracy is reported the same way.
+
+Every scenario is also OCR'd once more with per-cell OCR (batch_ocr=False), and the cell
+texts of the default single-call table OCR are checked against it: the batched path must
+read the same texts as the per-cell one.
+
+Usage:
+    python test-tools/bench_pipeline.py                     # compare with the baseline
+    python test-tools/bench_pipeline.py --update-baseline   # record a new baseline
+    python test-tools/bench_pipeline.py --quick --scenario dense
+
+The committed baseline (bench_baselines/pipeline.json) records the machine and the
+rasterizer (pdftoppm version) it was made with. Timings are only compared on the same
+machine; cell counts and texts depend on how the pages were rasterized, so they are only
+compared with the same pdftoppm.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import docx_writer
+import pdf_to_png
+import png_ocr
+import synthetic_pdf
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_baselines", "pipeline.json")
+STAGES = ["rasterize", "detect_tables", "detect_cells", "ocr", "docx"]
+
+# name -> synthetic document parameters
+SCENARIOS = {
+    "small": dict(pages=2, rows=10, cols=5, line_thickness=2, blank_ratio=0.2),
+    "dense": dict(pages=2, rows=40, cols=10, line_thickness=1, blank_ratio=0.5),
+    "thick": dict(pages=1, rows=20, cols=6, line_thickness=5, blank_ratio=0.0),
+    "sparse": dict(pages=2, rows=25, cols=8, line_thickness=2, blank_ratio=0.9),
+    "long": dict(pages=20, rows=15, cols=6, line_thickness=2, blank_ratio=0.3),
+    # Ruling lines that page-level line detection may lose: 1 px gray lines, and lines with
+    # scan dropouts
+    "faint": dict(pages=1, rows=15, cols=6, line_thickness=1, blank_ratio=0.3, line_gray=100),
+    "broken": dict(pages=1, rows=15, cols=6, line_thickness=2, blank_ratio=0.3, line_gaps=2),
+}
+QUICK_SCENARIOS = ["small", "dense"]
+
+
+def renderer_version():
+    """First line of `pdftoppm -v` (poppler prints its version there), or None if it won't run."""
+    try:
+        proc = subprocess.run(["pdftoppm", "-v"], capture_output=True, text=True, timeout=30)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    lines = (proc.stderr or proc.stdout).strip().splitlines()
+    return lines[0] if lines else None
+
+
+def cell_texts(results):
+    """All cell texts of a run, page by page and table by table, with whitespace normalized."""
+    return [" ".join(text.split()) for result in results for table in result["tables"]
+            for row in table["data"] for text in row]
+
+
+def text_accuracy(results, expected):
+    """
+    Share of the non-blank texts drawn into each page (`expected`, as returned by
+    synthetic_pdf.write_pdf) that were read exactly, in some cell of that page.
+    """
+    found = total = 0
+    for result, page_expected in zip(results, expected):
+        read = {}
+        for table in result["tables"]:
+            for row in table["data"]:
+                for text in row:
+                    text = " ".join(text.split())
+                    read[text] = read.get(text, 0) + 1
+        for row in page_expected:
+            for text in filter(None, row):
+                total += 1
+                if read.get(text, 0) > 0:
+                    read[text] -= 1
+                    found += 1
+    return found / max(1, total)
+
+
+def run_once(pdf_path, work_dir, dpi, ocr_options):
+    """Run the pipeline once; returns per-stage seconds and the page results."""
+    totals = dict.fromkeys(STAGES, 0.0)
+    results = []
+
+    pages = pdf_to_png.iter_pdf_pages(pdf_path, dpi=dpi)
+    while True:
+        start = time.perf_counter()
+        try:
+            _, page = next(pages)
+        except StopIteration:
+            break
+        image_cv = png_ocr.to_bgr_array(page)
+        totals["rasterize"] += time.perf_counter() - start
+
+        result = png_ocr.extract_structured_data(image_cv, **ocr_options)
+        for stage in ("detect_tables", "detect_cells", "ocr"):
+            totals[stage] += result["timings"][stage]
+        results.append(result)
+
+    start = time.perf_counter()
+    docx_writer.write_multi_page_ocr_output_to_docx(results, os.path.join(work_dir, "bench.docx"))
+    totals["docx"] = time.perf_counter() - start
+
+    return totals, results
+
+
+def batch_ocr_agreement(pdf_path, work_dir, dpi, ocr_options, results):
+    """
+    Share of the cells of `results` (a batch_ocr run) that per-cell OCR reads the same way,
+    and the first few cells where the two differ.
+    """
+    _, per_cell = run_once(pdf_path, work_dir, dpi, dict(ocr_options, batch_ocr=False))
+    batch_texts, per_cell_texts = cell_texts(results), cell_texts(per_cell)
+    if len(batch_texts) != len(per_cell_texts):
+        return 0.0, [f"{len(batch_texts)} cells with batch OCR, {len(per_cell_texts)} with per-cell OCR"]
+    mismatches = [f"{a!r} vs {b!r}" for a, b in zip(batch_texts, per_cell_texts) if a != b]
+    return 1 - len(mismatches) / max(1, len(batch_texts)), mismatches[:5]
+
+
+def run_scenario(name, params, repeat, dpi, ocr_options, check_ocr=True):
+    with tempfile.TemporaryDirectory() as work_dir:
+        pdf_path = os.path.join(work_dir, f"{name}.pdf")
+        expected = synthetic_pdf.write_pdf(pdf_path, dpi=dpi, **params)
+
+        runs = []
+        for _ in range(repeat):
+            timings, results = run_once(pdf_path, work_dir, dpi, ocr_options)
+            runs.append(timings)
+
+        agreement = mismatches = None
+        if check_ocr:
+            agreement, mismatches = batch_ocr_agreement(pdf_path, work_dir, dpi, ocr_options, results)
+
+    stages = {stage: statistics.median(run[stage] for run in runs) for stage in STAGES}
+    stages["total"] = sum(stages.values())
+    return {
+        "params": params,
+        "seconds": stages,
+        "cells_found": sum(result["stats"]["cells"] for result in results),
+        "cells_expected": params["pages"] * params["rows"] * params["cols"],
+        "text_accuracy": text_accuracy(results, expected),
+        "batch_ocr_agreement": agreement,
+        "batch_ocr_mismatches": mismatches,
+    }
+
+
+def compare(current, baseline, tolerance, min_delta, min_agreement, accuracy_tolerance, timings=True,
+            cells=True):
+    """
+    List of human-readable regressions of `current` against `baseline`; stage timings are
+    only compared with `timings`, cell counts and text accuracy only with `cells`.
+    """
+    regressions = []
+    for name, result in current.items():
+        agreement = result.get("batch_ocr_agreement")
+        if agreement is not None and agreement < min_agreement:
+            regressions.append(f"{name}: batch OCR agrees with per-cell OCR on {agreement:.1%} of cells "
+                               f"({'; '.join(result['batch_ocr_mismatches'])})")
+        base = baseline.get(name)
+        if base is None or base.get("params") != result["params"]:
+            continue  # New or changed scenario, nothing to compare with
+        for stage, seconds in result["seconds"].items() if timings else ():
+            before = base["seconds"].get(stage)
+            if before is None:
+                continue
+            if seconds > before * (1 + tolerance) and seconds - before > min_delta:
+                regressions.append(f"{name}/{stage}: {before:.3f}s -> {seconds:.3f}s "
+                                   f"(+{(seconds / before - 1) * 100 if before else float('inf'):.0f}%)")
+        if not cells:
+            continue
+        if result["cells_found"] != base.get("cells_found"):
+            regressions.append(f"{name}: cells found {base.get('cells_found')} -> {result['cells_found']}")
+        before = base.get("text_accuracy")
+        if before is not None and result["text_accuracy"] < before - accuracy_tolerance:
+            regressions.append(f"{name}: text accuracy {before:.1%} -> {result['text_accuracy']:.1%}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS), help="Run only these scenarios")
+    parser.add_argument("--quick", action="store_true", help=f"Run only {', '.join(QUICK_SCENARIOS)}")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per scenario (median is kept)")
+    parser.add_argument("--dpi", type=int, default=300)
+    parser.add_argument("--detect-scale", type=float, default=0.5)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative slowdown per stage")
+    parser.add_argument("--min-delta", type=float, default=0.05, help="Ignore slowdowns below this many seconds")
+    parser.add_argument("--min-agreement", type=float, default=0.98,
+                        help="Share of cells batch OCR must read like per-cell OCR")
+    parser.add_argument("--accuracy-tolerance", type=float, default=0.01,
+                        help="Allowed drop of the share of cell texts read correctly")
+    parser.add_argument("--skip-ocr-check", action="store_true", help="Don't compare batch with per-cell OCR")
+    parser.add_argument("--output", help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    names = args.scenario or (QUICK_SCENARIOS if args.quick else list(SCENARIOS))
+    ocr_options = {"detect_scale": args.detect_scale}
+
+    current = {}
+    for name in names:
+        print(f"[bench] {name} ...", flush=True)
+        current[name] = result = run_scenario(name, SCENARIOS[name], args.repeat, args.dpi, ocr_options,
+                                              check_ocr=not args.skip_ocr_check)
+        line = "  ".join(f"{stage}={seconds:.3f}s" for stage, seconds in result["seconds"].items())
+        line += f"  cells={result['cells_found']}/{result['cells_expected']}"
+        line += f"  text accuracy={result['text_accuracy']:.1%}"
+        if result["batch_ocr_agreement"] is not None:
+            line += f"  batch/per-cell agreement={result['batch_ocr_agreement']:.1%}"
+        print("        " + line)
+
+    report = {
+        "machine": {"platform": platform.platform(), "python": platform.python_version(), "cpus": os.cpu_count(),
+                    "renderer": renderer_version()},
+        "dpi": args.dpi,
+        "ocr_options": ocr_options,
+        "scenarios": current,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.update_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                baseline = json.load(f).get("scenarios", {})
+        baseline.update(current)
+        report["scenarios"] = baseline
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"[bench] Baseline written to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"[bench] No baseline at {args.baseline}; record one with --update-baseline")
+        return 1
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    same_machine = baseline.get("machine") == report["machine"]
+    same_renderer = (baseline.get("machine") or {}).get("renderer") == report["machine"]["renderer"]
+    if not same_renderer:
+        print(f"[bench] Baseline was rasterized with {(baseline.get('machine') or {}).get('renderer')!r}, "
+              f"not {report['machine']['renderer']!r}: only batch/per-cell OCR agreement is checked; "
+              "record a baseline here with --update-baseline")
+    elif not same_machine:
+        print("[bench] Baseline was recorded on a different machine, only cells and texts are compared")
+    if (baseline.get("dpi"), baseline.get("ocr_options")) != (args.dpi, ocr_options):
+        print("[bench] Warning: baseline was recorded with different dpi/OCR options")
+
+    regressions = compare(current, baseline.get("scenarios", {}), args.tolerance, args.min_delta,
+                          args.min_agreement, args.accuracy_tolerance, timings=same_machine,
+                          cells=same_renderer)
+    if regressions:
+        print("[bench] REGRESSIONS:")
+        for line in regressions:
+            print(f"  - {line}")
+        return 1
+    print("[bench] No regressions against the baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
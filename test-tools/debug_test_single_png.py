@@ -3,7 +3,7 @@ from PIL import Image
 import json
 
 from png_ocr import extract_structured_data
-from docx_writer import write_ocr_output_to_docx
+from docx_writer import write_multi_page_ocr_output_to_docx
 
 # === CONFIG ===
 image_path = "/home/omeo/PycharmProjects/PythonProject11/output_pages/page_001.png"
@@ -32,4 +32,4 @@ print(json.dumps({
 
 # === SAVE DOCX ===
 print(f"\n[DEBUG WRAPPER] Writing DOCX to: {output_docx_path}")
-write_ocr_output_to_docx(ocr_data, output_docx_path)
+write_multi_page_ocr_output_to_docx([ocr_data], output_docx_path)
@@ -1,6 +1,6 @@
 from PIL import Image
 from png_ocr import extract_structured_data
-from docx_writer import write_ocr_output_to_docx
+from docx_writer import write_multi_page_ocr_output_to_docx
 import cv2
 
 # === Paths ===
@@ -15,7 +15,7 @@ image_pil = Image.open(input_image_path).convert("RGB")
 ocr_data = extract_structured_data(image_pil, debug=True, debug_id=debug_id)
 
 # === Write to DOCX ===
-write_ocr_output_to_docx(ocr_data, output_docx_path)
+write_multi_page_ocr_output_to_docx([ocr_data], output_docx_path)
 
 print(f"✅ Saved: {output_docx_path}")
 
@@ -31,6 +31,40 @@ def validate_inputs():
     else:
         run_button.config(state="disabled")
 
+def batch_process_folder(input_folder, output_folder):
+    """
+    Convert every PDF and image in input_folder to <name>.docx in output_folder.
+    All PDF pages go through the same worker pool (warm OCR engines), like the service's /batch/ endpoint.
+    Returns ([converted names], [(name, error)]).
+    """
+    from PIL import Image
+    import docx_writer
+    import png_ocr
+    import workers
+
+    converted, failed = [], []
+    try:
+        for name in sorted(os.listdir(input_folder)):
+            stem, ext = os.path.splitext(name)
+            path = os.path.join(input_folder, name)
+            if ext.lower() not in (".pdf", ".png", ".jpg", ".jpeg") or not os.path.isfile(path):
+                continue
+            status_var.set(f"Running... {name}")
+            root.update_idletasks()
+            try:
+                if ext.lower() == ".pdf":
+                    pages = workers.process_pdf_pages(path, **workers.default_ocr_options())
+                else:
+                    with Image.open(path) as image:
+                        pages = [png_ocr.extract_structured_data(image.convert("RGB"), debug=False)]
+                docx_writer.write_multi_page_ocr_output_to_docx(pages, os.path.join(output_folder, stem + ".docx"))
+                converted.append(name)
+            except Exception as e:
+                failed.append((name, e))
+    finally:
+        workers.shutdown()
+    return converted, failed
+
 def run_selected_module():
     input_path = input_path_var.get()
     output_folder = output_folder_var.get()
@@ -52,9 +86,11 @@ def run_selected_module():
             messagebox.showinfo("Info", f"Would run OCR & table detection on single image:\n{input_path}\nOutput to:\n{output_folder}")
 
         elif module == "PNG OCR & Table Detect (batch)":
-            # import png_ocr
-            # png_ocr.batch_process_images(input_path, output_folder)
-            messagebox.showinfo("Info", f"Would run OCR & table detection on batch folder:\n{input_path}\nOutput to:\n{output_folder}")
+            converted, failed = batch_process_folder(input_path, output_folder)
+            message = f"Converted {len(converted)} file(s) to DOCX in:\n{output_folder}"
+            if failed:
+                message += "\n\nFailed:\n" + "\n".join(f"{name}: {error}" for name, error in failed)
+            messagebox.showinfo("Info", message)
 
         elif module == "Write DOCX":
             # import docx_writer
@@ -75,51 +111,59 @@ def on_module_change(*args):
     input_path_var.set("")
     validate_inputs()
 
-root = Tk()
-root.title("PDEffer GUI")
-root.geometry("500x250")
-root.resizable(False, False)
-
-input_path_var = StringVar()
-output_folder_var = StringVar()
-module_var = StringVar(value="PDF to PNG")
-status_var = StringVar(value="")
-
-# Input selection
-Label(root, text="Input File or Folder:").grid(row=0, column=0, sticky='e', padx=10, pady=10)
-input_entry = Label(root, textvariable=input_path_var, anchor="w", relief="sunken", width=50)
-input_entry.grid(row=0, column=1, padx=10, pady=10, sticky='we')
-Button(root, text="Browse...", command=select_input).grid(row=0, column=2, padx=10)
-
-# Output folder selection
-Label(root, text="Output Folder:").grid(row=1, column=0, sticky='e', padx=10, pady=10)
-output_entry = Label(root, textvariable=output_folder_var, anchor="w", relief="sunken", width=50)
-output_entry.grid(row=1, column=1, padx=10, pady=10, sticky='we')
-Button(root, text="Browse...", command=select_output_folder).grid(row=1, column=2, padx=10)
-
-# Module selection
-Label(root, text="Select Module to Run:").grid(row=2, column=0, sticky='e', padx=10, pady=10)
-modules = [
-    "PDF to PNG",
-    "PNG OCR & Table Detect (single)",
-    "PNG OCR & Table Detect (batch)",
-    "Write DOCX"
-]
-module_menu = OptionMenu(root, module_var, *modules)
-module_menu.grid(row=2, column=1, padx=10, pady=10, sticky='we')
-
-# Run button
-run_button = Button(root, text="Run", command=run_selected_module, state="disabled")
-run_button.grid(row=3, column=1, pady=20)
-
-# Status label
-status_label = Label(root, textvariable=status_var, anchor='w')
-status_label.grid(row=4, column=0, columnspan=3, padx=10, sticky='we')
-
-# Bind module_var change event to reset input and validate
-module_var.trace_add("write", on_module_change)
-
-# Grid column configuration for responsive layout
-root.grid_columnconfigure(1, weight=1)
-
-root.mainloop()
+def main():
+    # Built here rather than at import time: the batch mode's page workers are started with
+    # forkserver/spawn, which re-import this module and must not open a window of their own
+    global root, input_path_var, output_folder_var, module_var, status_var, run_button
+
+    root = Tk()
+    root.title("PDEffer GUI")
+    root.geometry("500x250")
+    root.resizable(False, False)
+
+    input_path_var = StringVar()
+    output_folder_var = StringVar()
+    module_var = StringVar(value="PDF to PNG")
+    status_var = StringVar(value="")
+
+    # Input selection
+    Label(root, text="Input File or Folder:").grid(row=0, column=0, sticky='e', padx=10, pady=10)
+    input_entry = Label(root, textvariable=input_path_var, anchor="w", relief="sunken", width=50)
+    input_entry.grid(row=0, column=1, padx=10, pady=10, sticky='we')
+    Button(root, text="Browse...", command=select_input).grid(row=0, column=2, padx=10)
+
+    # Output folder selection
+    Label(root, text="Output Folder:").grid(row=1, column=0, sticky='e', padx=10, pady=10)
+    output_entry = Label(root, textvariable=output_folder_var, anchor="w", relief="sunken", width=50)
+    output_entry.grid(row=1, column=1, padx=10, pady=10, sticky='we')
+    Button(root, text="Browse...", command=select_output_folder).grid(row=1, column=2, padx=10)
+
+    # Module selection
+    Label(root, text="Select Module to Run:").grid(row=2, column=0, sticky='e', padx=10, pady=10)
+    modules = [
+        "PDF to PNG",
+        "PNG OCR & Table Detect (single)",
+        "PNG OCR & Table Detect (batch)",
+        "Write DOCX"
+    ]
+    module_menu = OptionMenu(root, module_var, *modules)
+    module_menu.grid(row=2, column=1, padx=10, pady=10, sticky='we')
+
+    # Run button
+    run_button = Button(root, text="Run", command=run_selected_module, state="disabled")
+    run_button.grid(row=3, column=1, pady=20)
+
+    # Status label
+    status_label = Label(root, textvariable=status_var, anchor='w')
+    status_label.grid(row=4, column=0, columnspan=3, padx=10, sticky='we')
+
+    # Bind module_var change event to reset input and validate
+    module_var.trace_add("write", on_module_change)
+
+    # Grid column configuration for responsive layout
+    root.grid_columnconfigure(1, weight=1)
+
+    root.mainloop()
+
+if __name__ == "__main__":
+    main()
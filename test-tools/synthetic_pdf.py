@@ -0,0 +1,104 @@
+"""
+Offline generator of synthetic table PDFs for benchmarks.
+
+Pages are drawn with Pillow (ruled tables with text in the cells) and saved as an image PDF,
+so no network, fonts or PDF libraries beyond Pillow are needed. Output is deterministic for
+a given seed.
+
+Usage: python test-tools/synthetic_pdf.py out.pdf [pages] [rows] [cols]
+"""
+import random
+import sys
+
+from PIL import Image, ImageDraw, ImageFont
+
+WORDS = ["Invoice", "Total", "Qty", "Unit", "Price", "EUR", "Article", "Delivery", "Net", "VAT",
+         "Item", "Date", "Order", "Amount", "Discount", "Customer", "Code", "Weight", "Stock"]
+
+
+def _cell_text(rng):
+    if rng.random() < 0.5:
+        return f"{rng.randint(1, 99999):,}.{rng.randint(0, 99):02d}"
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 2)))
+
+
+def draw_page(rows, cols, line_thickness=2, blank_ratio=0.3, dpi=300, seed=0, line_gray=0, line_gaps=0):
+    """
+    Draw one A4 page holding a single ruled table.
+
+    `line_gray` is the gray level of the ruling lines (0 = black, higher = fainter) and
+    `line_gaps` the number of small breaks per inch of line, like the dropouts of a scan.
+
+    Returns:
+    - (page, expected) where page is an RGB PIL image and expected is the list of rows of
+      cell texts ("" for blank cells).
+    """
+    rng = random.Random(seed)
+    width, height = int(8.27 * dpi), int(11.69 * dpi)
+    page = Image.new("RGB", (width, height), "white")
+    draw = ImageDraw.Draw(page)
+    font = ImageFont.load_default(size=max(10, dpi // 12))
+
+    margin = dpi // 2
+    draw.text((margin, margin // 2), "Synthetic benchmark document", fill="black", font=font)
+
+    top = margin + dpi // 4
+    cell_w = (width - 2 * margin) // cols
+    cell_h = min(dpi // 4, (height - top - margin) // rows)
+
+    expected = []
+    for r in range(rows):
+        row = []
+        for c in range(cols):
+            text = "" if rng.random() < blank_ratio else _cell_text(rng)
+            if text:
+                x = margin + c * cell_w + line_thickness + dpi // 30
+                y = top + r * cell_h + (cell_h - font.size) // 2
+                draw.text((x, y), text, fill="black", font=font)
+            row.append(text)
+        expected.append(row)
+
+    right, bottom = margin + cols * cell_w, top + rows * cell_h
+    line_fill = (line_gray,) * 3
+    gap = max(2, dpi // 100)
+    for r in range(rows + 1):
+        y = top + r * cell_h
+        draw.rectangle([margin, y, right + line_thickness - 1, y + line_thickness - 1], fill=line_fill)
+        for _ in range(int(line_gaps * (right - margin) / dpi)):
+            x = rng.randrange(margin, right)
+            draw.rectangle([x, y, x + gap - 1, y + line_thickness - 1], fill="white")
+    for c in range(cols + 1):
+        x = margin + c * cell_w
+        draw.rectangle([x, top, x + line_thickness - 1, bottom + line_thickness - 1], fill=line_fill)
+        for _ in range(int(line_gaps * (bottom - top) / dpi)):
+            y = rng.randrange(top, bottom)
+            draw.rectangle([x, y, x + line_thickness - 1, y + gap - 1], fill="white")
+
+    return page, expected
+
+
+def write_pdf(path, pages=1, rows=10, cols=5, line_thickness=2, blank_ratio=0.3, dpi=300, seed=0, line_gray=0,
+              line_gaps=0):
+    """
+    Write a PDF of `pages` synthetic table pages.
+
+    Returns:
+    - List of the expected cell texts per page (see draw_page).
+    """
+    images, expected = [], []
+    for i in range(pages):
+        page, page_expected = draw_page(rows, cols, line_thickness, blank_ratio, dpi, seed=seed + i,
+                                         line_gray=line_gray, line_gaps=line_gaps)
+        images.append(page)
+        expected.append(page_expected)
+    images[0].save(path, "PDF", save_all=True, append_images=images[1:], resolution=dpi)
+    return expected
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python synthetic_pdf.py out.pdf [pages] [rows] [cols]")
+    else:
+        args = [int(a) for a in sys.argv[2:5]]
+        write_pdf(sys.argv[1], *args)
+        print(f"Saved: {sys.argv[1]}")
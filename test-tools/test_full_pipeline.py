@@ -1,14 +1,15 @@
 import os
+import sys
 from PIL import Image
 import cv2
 
-from pdf_to_png import pdf_to_png as convert_pdf_to_png
+from pdf_to_png import convert_pdf_to_png
 
 from png_ocr import extract_structured_data
-from docx_writer import write_ocr_output_to_docx
+from docx_writer import write_multi_page_ocr_output_to_docx
 
 # === Input PDF ===
-input_pdf_path = "/home/omeo/Documents/testpdf2.pdf"  # CHANGE if needed
+input_pdf_path = sys.argv[1] if len(sys.argv) > 1 else "/home/omeo/Documents/testpdf2.pdf"  # CHANGE if needed
 
 # === Output folders ===
 png_output_folder = "output_pages"
@@ -48,7 +49,7 @@ for i, image_path in enumerate(image_paths):
 
     # Save DOCX
     docx_path = os.path.join(docx_output_folder, f"{page_id}.docx")
-    write_ocr_output_to_docx(ocr_data, docx_path)
+    write_multi_page_ocr_output_to_docx([ocr_data], docx_path)
     print(f"[✅] DOCX saved: {docx_path}")
 
     # Save debug overlay
@@ -1,6 +1,6 @@
 from PIL import Image
 from png_ocr import extract_structured_data
-from docx_writer import write_ocr_output_to_docx
+from docx_writer import write_multi_page_ocr_output_to_docx
 
 input_image_path = "output_pages/page_001.png"
 output_docx_path = "output_docx/page1.docx"
@@ -10,7 +10,7 @@ print("[DEBUG] Starting script...")
 
 image = Image.open(input_image_path).convert("RGB")
 ocr_data = extract_structured_data(image, debug=True, debug_id=debug_id)
-write_ocr_output_to_docx(ocr_data, output_docx_path)
+write_multi_page_ocr_output_to_docx([ocr_data], output_docx_path)
 
 
 try:
@@ -33,7 +33,7 @@ try:
             print(f"        {row}")
 
     # Write DOCX output
-    write_ocr_output_to_docx(ocr_data, output_docx_path)
+    write_multi_page_ocr_output_to_docx([ocr_data], output_docx_path)
     print(f"[✅] DOCX saved to: {output_docx_path}")
 
 except Exception as e:
@@ -0,0 +1,169 @@
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import cv2
+
+# Fraction of jobs traced without being asked to (0 = only jobs submitted with trace/debug)
+TRACE_JOB_RATE = float(os.environ.get("PDEFFER_TRACE_JOB_RATE", 0.0))
+# Fraction of debug images kept in a trace bundle (debug runs keep all of them)
+TRACE_IMAGE_RATE = float(os.environ.get("PDEFFER_TRACE_IMAGE_RATE", 0.05))
+# Images waiting for the writer beyond this are dropped instead of piling up in memory
+TRACE_MAX_PENDING = int(os.environ.get("PDEFFER_TRACE_MAX_PENDING", 64))
+
+_writer = None
+_writer_lock = threading.Lock()
+_pending = 0
+
+
+def _get_writer():
+    # Created on first use, so every worker process gets its own writer thread
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="trace-writer")
+    return _writer
+
+
+def _submit(fn, *args, droppable=False):
+    """Run fn(*args) on the background writer; returns False if it was dropped."""
+    global _pending
+    with _writer_lock:
+        if droppable and _pending >= TRACE_MAX_PENDING:
+            return False
+        _pending += 1
+
+    def _run():
+        global _pending
+        try:
+            fn(*args)
+        except Exception as e:
+            print(f"[trace] Write failed: {e}")
+        finally:
+            with _writer_lock:
+                _pending -= 1
+
+    _get_writer().submit(_run)
+    return True
+
+
+def _write_json(path, obj):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(obj, f, indent=1)
+    os.replace(tmp_path, path)
+
+
+def _write_image(path, image):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    cv2.imwrite(path, image)
+
+
+def should_trace(requested=False):
+    """Whether a new job is traced: when asked for, otherwise for TRACE_JOB_RATE of all jobs."""
+    return requested or random.random() < TRACE_JOB_RATE
+
+
+class Tracer:
+    """
+    Collects a tree of timing spans and a sample of debug images for one unit of work (a job
+    or a page) and writes them into a trace bundle directory.
+
+    Recording a span only appends to an in-memory tree. Images are copied and handed to a
+    background writer thread, so neither blocks the pipeline on disk I/O. A tracer is used by
+    one thread at a time.
+    """
+
+    def __init__(self, directory, name, image_rate=TRACE_IMAGE_RATE, seed=None):
+        self.directory = directory
+        self.name = name
+        self.image_rate = image_rate
+        self._rng = random.Random(seed)
+        self._start = time.perf_counter()
+        self.root = {"name": name, "start": 0.0, "duration": None, "attrs": {}, "children": []}
+        self._stack = [self.root]
+        self.images = []
+        self.images_dropped = 0
+
+    @contextmanager
+    def span(self, name, **attrs):
+        """Time the enclosed block as a child of the current span."""
+        node = {"name": name, "start": time.perf_counter() - self._start, "duration": None,
+                "attrs": attrs, "children": []}
+        self._stack[-1]["children"].append(node)
+        self._stack.append(node)
+        try:
+            yield node
+        finally:
+            node["duration"] = time.perf_counter() - self._start - node["start"]
+            self._stack.pop()
+
+    def annotate(self, **attrs):
+        """Add attributes to the current span."""
+        self._stack[-1]["attrs"].update(attrs)
+
+    def image(self, name, image):
+        """
+        Keep a debug image with probability image_rate. It is written in the background as
+        images/<tracer name>_<n>_<name>.png and listed with the span it was taken in.
+        """
+        if self.image_rate <= 0 or self._rng.random() >= self.image_rate:
+            return
+        filename = f"{self.name}_{len(self.images):04d}_{name}.png"
+        path = os.path.join(self.directory, "images", filename)
+        if _submit(_write_image, path, image.copy(), droppable=True):
+            self.images.append({"file": f"images/{filename}", "span": self._stack[-1]["name"]})
+        else:
+            self.images_dropped += 1
+
+    def to_dict(self):
+        self.root["duration"] = time.perf_counter() - self._start
+        return {
+            "spans": self.root,
+            "images": self.images,
+            "images_dropped": self.images_dropped,
+        }
+
+    def write(self):
+        """Write the span tree as <directory>/<name>.json on the background writer."""
+        path = os.path.join(self.directory, f"{self.name}.json")
+        _submit(_write_json, path, self.to_dict())
+
+
+class NullTracer:
+    """Stand-in used when tracing is off: same interface, records nothing."""
+    images = ()
+
+    def __bool__(self):
+        return False
+
+    @contextmanager
+    def span(self, name, **attrs):
+        yield None
+
+    def annotate(self, **attrs):
+        pass
+
+    def image(self, name, image):
+        pass
+
+    def to_dict(self):
+        return None
+
+    def write(self):
+        pass
+
+
+NULL_TRACER = NullTracer()
+
+
+def flush(timeout=None):
+    """Wait until everything submitted so far has been written."""
+    if _writer is not None:
+        _writer.submit(lambda: None).result(timeout)
@@ -0,0 +1,225 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+import cache
+import ocr_engine
+import pdf_to_png
+import png_ocr
+import tracing
+
+OCR_WORKERS = int(os.environ.get("PDEFFER_OCR_WORKERS", os.cpu_count() or 1))
+# Max pages of one job in flight at once, so a single large job can't take every worker
+PAGES_PER_JOB = int(os.environ.get("PDEFFER_PAGES_PER_JOB", max(1, OCR_WORKERS // 2)))
+# Resolution of table/grid detection relative to the render (0.5 = 150 DPI for a 300 DPI render)
+DETECT_SCALE = float(os.environ.get("PDEFFER_DETECT_SCALE", 0.5))
+# Use the PDF's own text layer instead of OCR when a page has one
+USE_TEXT_LAYER = os.environ.get("PDEFFER_USE_TEXT_LAYER", "1") == "1"
+# Fewer embedded words than this and the page is treated as scanned
+MIN_TEXT_LAYER_WORDS = int(os.environ.get("PDEFFER_MIN_TEXT_LAYER_WORDS", 3))
+# Ink pixels below which a cell counts as blank and is not OCR'd
+BLANK_CELL_MIN_INK = int(os.environ.get("PDEFFER_BLANK_CELL_MIN_INK", png_ocr.BLANK_CELL_MIN_INK))
+
+_executor = None
+
+
+def default_ocr_options(use_hough=False):
+    """OCR options the service passes to extract_structured_data for every page."""
+    return {
+        "use_hough": use_hough,
+        "detect_scale": DETECT_SCALE,
+        "blank_min_ink": BLANK_CELL_MIN_INK,
+    }
+
+
+def _init_worker():
+    # Each worker OCRs one page at a time, so one warm engine per process is enough
+    ocr_engine.init_pool(size=1, warm=True)
+
+
+def get_executor():
+    """
+    Return the shared page worker pool, starting it on first use.
+
+    The pool is usually started from a job thread, when the server already runs other threads
+    (job runners, the archive thread, the event loop). Forking then could leave a worker with
+    a lock held by one of those threads, so workers are started from a forkserver (or spawned
+    where that is unavailable) instead.
+    """
+    global _executor
+    if _executor is None:
+        method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+        _executor = ProcessPoolExecutor(max_workers=OCR_WORKERS, initializer=_init_worker,
+                                        mp_context=multiprocessing.get_context(method))
+    return _executor
+
+
+def shutdown():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def process_page(pdf_path, page_number, dpi=300, archive_dir=None, trace_dir=None, **ocr_options):
+    """
+    Render a single PDF page and extract its tables. Runs inside a worker process, so the
+    page image never has to be pickled between processes.
+
+    With a trace_dir, the page's span tree and sampled debug images are written there (see
+    tracing.Tracer); debug runs keep every image.
+    """
+    start = time.perf_counter()
+    if trace_dir:
+        image_rate = 1.0 if ocr_options.get("debug") else tracing.TRACE_IMAGE_RATE
+        trace = tracing.Tracer(trace_dir, trace_name(page_number), image_rate=image_rate, seed=page_number)
+    else:
+        trace = tracing.NULL_TRACER
+
+    with trace.span("render", dpi=dpi):
+        _, page = next(pdf_to_png.iter_pdf_pages(pdf_path, dpi=dpi, first_page=page_number, last_page=page_number))
+
+        if archive_dir:
+            # Written in the background while the page is OCR'd; process_pdf_pages waits for
+            # all of a job's archived pages once, at the end. The page is decoded first so that
+            # the archive thread and to_bgr_array never load the lazy image at the same time.
+            page.load()
+            pdf_to_png.archive_page(page, archive_path(archive_dir, page_number))
+
+        image_cv = png_ocr.to_bgr_array(page)
+        del page
+    render_time = time.perf_counter() - start
+
+    # Born-digital pages use their embedded words; tables the words miss are still OCR'd
+    if USE_TEXT_LAYER:
+        with trace.span("text_layer"):
+            words = pdf_to_png.extract_text_words(pdf_path, page_number, dpi=dpi)
+            trace.annotate(words=len(words))
+        if len(words) >= MIN_TEXT_LAYER_WORDS:
+            ocr_options["words"] = words
+
+    # Debug runs always recompute, since their point is the debug output
+    if ocr_options.get("debug"):
+        result = png_ocr.extract_structured_data(image_cv, trace=trace, **ocr_options)
+    else:
+        key = cache.page_key(image_cv, page_cache_params(dpi, ocr_options))
+        with trace.span("page_cache"):
+            result = cache.page_cache.read_json(key)
+            hit = result is not None
+            trace.annotate(hit=hit)
+        if hit:
+            result["timings"] = {}  # Stage timings of the original run don't apply
+        else:
+            result = png_ocr.extract_structured_data(image_cv, trace=trace, **ocr_options)
+            cache.page_cache.write_json(key, result)
+
+        # Lets the owning process keep the cache's LRU order and hit/miss counters
+        result["page_cache"] = {"key": key, "hit": hit}
+
+    result["timings"]["render"] = render_time
+    result["timings"]["total"] = time.perf_counter() - start
+    trace.annotate(text_source=result["text_source"], **result["stats"])
+    trace.write()
+    return result
+
+
+def archive_path(archive_dir, page_number):
+    return os.path.join(archive_dir, f"page_{page_number:03d}.png")
+
+
+def trace_name(page_number):
+    return f"page_{page_number:03d}"
+
+
+def page_cache_params(dpi, ocr_options):
+    """Everything besides the page pixels that affects a page's OCR result."""
+    params = {k: v for k, v in ocr_options.items() if k not in ("debug", "debug_id", "words")}
+    params.update(dpi=dpi, ocr_backend=ocr_engine.resolve_backend(), ocr_lang=ocr_engine.OCR_LANG)
+    if "words" in ocr_options:
+        params["text_layer"] = [(w["text"], w["left"], w["top"]) for w in ocr_options["words"]]
+    return params
+
+
+def process_pdf_pages(pdf_path, page_count=None, dpi=300, max_in_flight=PAGES_PER_JOB,
+                      archive_dir=None, on_page=None, trace_dir=None, scheduler=None, client_id=None,
+                      job_id=None, **ocr_options):
+    """
+    OCR all pages of a PDF on the worker pool.
+
+    At most `max_in_flight` pages of this PDF are queued on the pool at any time; a new page
+    is submitted whenever one finishes. Results are returned in page order.
+
+    Parameters:
+    - pdf_path (str): Path to the input PDF file.
+    - page_count (int): Number of pages, read with pdfinfo when not given.
+    - dpi (int): Render resolution.
+    - max_in_flight (int): Per-job page concurrency.
+    - archive_dir (str): If set, every rendered page is also saved there as PNG, in the background;
+      the call returns once all of them are written.
+    - on_page (callable): Called as on_page(page_number, result) as soon as a page is done.
+    - trace_dir (str): If set, every page writes its trace there (see process_page), in the
+      background; the call returns once every page's span tree (written after its images) is there.
+    - scheduler (scheduler.PageScheduler): If set, every page waits for a slot from it before
+      going to the pool, shared fairly between clients (client_id); job_id is the job whose
+      backlog the finished pages are taken off.
+    - ocr_options: Passed through to png_ocr.extract_structured_data.
+
+    Returns:
+    - List of extract_structured_data results, one per page. Pages looked up in the page cache
+      also have "cache_hit" (bool); their stats are those of the run that filled the cache.
+    """
+    if page_count is None:
+        page_count = pdf_to_png.get_page_count(pdf_path)
+
+    executor = get_executor()
+    results = [None] * page_count
+    pending = {}
+    next_page = 1
+
+    try:
+        while next_page <= page_count or pending:
+            while next_page <= page_count and len(pending) < max(1, max_in_flight):
+                if scheduler is not None:
+                    token = scheduler.acquire(client_id)
+                try:
+                    future = executor.submit(process_page, pdf_path, next_page, dpi, archive_dir, trace_dir,
+                                             **ocr_options)
+                except BaseException:
+                    if scheduler is not None:
+                        scheduler.release(token)
+                    raise
+                if scheduler is not None:
+                    # Released by the pool as soon as the page is done (or cancelled)
+                    future.add_done_callback(lambda _, token=token: scheduler.release(token, job_id))
+                pending[future] = next_page
+                next_page += 1
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                page_number = pending.pop(future)
+                results[page_number - 1] = result = future.result()
+                page_cache_info = result.pop("page_cache", None)
+                if page_cache_info is not None:
+                    cache.page_cache.record(page_cache_info["key"], page_cache_info["hit"])
+                    result["cache_hit"] = page_cache_info["hit"]
+                if on_page is not None:
+                    on_page(page_number, result)
+    finally:
+        for future in pending:
+            future.cancel()
+
+    if archive_dir:
+        missing = pdf_to_png.wait_for_archives([archive_path(archive_dir, n) for n in range(1, page_count + 1)])
+        if missing:
+            print(f"[workers] {len(missing)} archived page(s) of {pdf_path} were not written")
+
+    if trace_dir:
+        # Each worker's trace writer handles a page's images before its span tree, so once the
+        # span trees are there the bundle is complete
+        missing = pdf_to_png.wait_for_archives(
+            [os.path.join(trace_dir, f"{trace_name(n)}.json") for n in range(1, page_count + 1)])
+        if missing:
+            print(f"[workers] {len(missing)} page trace(s) of {pdf_path} were not written")
+
+    return results